@@ -34,17 +34,22 @@ def configure_mqtt_environment():
     """
     Detects if the environment requires a Mock MQTT client.
     Patches sys.modules to substitute paho.mqtt with the mock if needed.
+    Setting MIMIC_MQTT=inprocess selects the bundled broker-less transport.
+    Must run before anything imports paho.mqtt.client.
     """
     mock_mqtt = None
     
     # 1. Try importing the mock from known locations
-    try:
-        import tests.mock_paho_mqtt_plugin as mock_mqtt
-    except ImportError:
+    if os.environ.get("MIMIC_MQTT", "").lower() == "inprocess":
+        import src.gui.devices.frontend.inprocess_mqtt as mock_mqtt
+    else:
         try:
-            import mock_paho_mqtt_plugin as mock_mqtt
+            import tests.mock_paho_mqtt_plugin as mock_mqtt
         except ImportError:
-            pass
+            try:
+                import mock_paho_mqtt_plugin as mock_mqtt
+            except ImportError:
+                pass
 
     # 2. Apply patch if mock is found
     if mock_mqtt:
@@ -52,6 +57,7 @@ def configure_mqtt_environment():
         sys.modules["paho.mqtt"] = mock_mqtt
         sys.modules["paho.mqtt.client"] = mock_mqtt
         mock_mqtt.client = mock_mqtt
+        mock_mqtt.mqtt = mock_mqtt
         print(">> [System] WARNING: Running with MOCK MQTT Environment")
 
 setup_path()
@@ -1,8 +1,9 @@
 import sys
 import os
 from PyQt6.QtWidgets import QApplication
-from src.gui.main_window import MainWindow
 import InitializeMIMIC
+InitializeMIMIC.configure_mqtt_environment()
+from src.gui.main_window import MainWindow
 
 if __name__ == "__main__":
 
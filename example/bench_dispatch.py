@@ -0,0 +1,77 @@
+"""
+Measures MIMIC's own MQTT dispatch overhead with the in-process transport:
+no broker, no network, only router matching, payload decoding, buffering
+and the GUI-side drain.
+
+    python example/bench_dispatch.py --devices 80 --channels 8 --messages 200000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.gui.devices.frontend.inprocess_mqtt as inprocess_mqtt
+inprocess_mqtt.install()
+
+from PyQt6.QtCore import QCoreApplication
+from src.gui.devices.frontend.universal_mqtt import UniversalMqttDevice
+from src.gui.devices.frontend.payload_codecs import compile_codec
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, default=80)
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--delivery", choices=["sync", "thread"], default="sync")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    inprocess_mqtt.get_broker("bench", 1883, delivery=args.delivery)
+
+    received = [0]
+    def handler(topic, value):
+        received[0] += 1
+
+    devices = []
+    topics = []
+    for d in range(args.devices):
+        device = UniversalMqttDevice(f"bench/dev{d}", broker_address="bench", subscription_mode="batch")
+        for c in range(args.channels):
+            device.subscribe_param(f"value/{c}", handler=handler, history_handler=lambda t, s: None,
+                                   codec=compile_codec("float"))
+            topics.append(f"bench/dev{d}/value/{c}")
+        device.commit_subscriptions()
+        devices.append(device)
+    handler_obj = devices[0].mqtt
+
+    publisher = inprocess_mqtt.Client(client_id="bench_publisher")
+    publisher.connect("bench", 1883)
+
+    n_topics = len(topics)
+    t0 = time.perf_counter()
+    for i in range(args.messages):
+        publisher.publish(topics[i % n_topics], "1.2345")
+    if args.delivery == "thread":
+        while handler_obj.buffer.received < args.messages:
+            time.sleep(0.001)
+    t_ingest = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    handler_obj.drain()
+    t_drain = time.perf_counter() - t0
+
+    print(f"Devices: {args.devices}, channels: {n_topics}, messages: {args.messages} ({args.delivery})")
+    print(f"Ingest (match + decode + buffer): {args.messages / t_ingest:,.0f} msg/s "
+          f"({t_ingest / args.messages * 1e6:.2f} us/msg)")
+    print(f"GUI drain: {t_drain * 1000:.1f} ms for {received[0]} coalesced updates, "
+          f"{handler_obj.buffer.dropped} history samples dropped")
+
+    for device in devices:
+        device.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Checks that malformed payloads cannot break the shared MQTT connection: a
+device in wildcard mode receives binary garbage on unknown subtopics and on
+its own channels, and must keep delivering the valid messages around it.
+Uses the in-process transport, so no broker is needed.
+
+    python example/check_ingest.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.gui.devices.frontend.inprocess_mqtt as inprocess_mqtt
+inprocess_mqtt.install()
+
+from PyQt6.QtCore import QCoreApplication
+from src.gui.devices.frontend.universal_mqtt import UniversalMqttDevice
+from src.gui.devices.frontend.payload_codecs import compile_codec
+
+BINARY = b"\xff\xfe\x00\x81binary"
+
+
+def main():
+    app = QCoreApplication(sys.argv)
+    inprocess_mqtt.get_broker("check", 1883, delivery="sync")
+
+    received = []
+    device = UniversalMqttDevice("check/dev", broker_address="check", subscription_mode="wildcard")
+    device.subscribe_param("value", handler=lambda topic, value: received.append(value),
+                           codec=compile_codec("float"))
+    device.subscribe_param("text", handler=lambda topic, value: received.append(value))
+    handler = device.mqtt
+
+    publisher = inprocess_mqtt.Client(client_id="check_publisher")
+    publisher.connect("check", 1883)
+    publisher.publish("check/dev/value", "1.5")
+    publisher.publish("check/dev/unknown/blob", BINARY)   # unrouted, under the wildcard
+    publisher.publish("check/dev/text", BINARY)           # routed, no codec
+    publisher.publish("check/dev/value", BINARY)          # routed, float codec
+    publisher.publish("check/dev/value", "2.5")
+    handler.drain()
+
+    # Calling the callback directly, as paho does, must not raise either
+    handler.on_message(None, None, inprocess_mqtt.MQTTMessage("check/dev/unknown/blob", BINARY))
+    handler.on_message(None, None, inprocess_mqtt.MQTTMessage("check/dev/value", b"3.5"))
+    handler.drain()
+
+    failures = []
+    if received != [2.5, 3.5]:
+        failures.append(f"expected the valid values [2.5, 3.5] to be delivered, got {received}")
+    if handler.decode_errors != 1:
+        failures.append(f"expected 1 decode error on the codec-less channel, got {handler.decode_errors}")
+    if handler.callback_errors:
+        failures.append(f"{handler.callback_errors} messages reached the on_message fallback")
+
+    device.close()
+    handler.stop()
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK: malformed payloads were dropped and valid messages still delivered")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Load generator for finding MIMIC's saturation point.
+
+Publishes the status channels of the devices in a MIMIC YAML at a fixed rate
+per channel (up to kHz), optionally multiplied into N synthetic copies of every
+device under different base topics. Payloads are encoded the way each
+channel's codec decodes them (wavemeters publish "(timestamp, frequency)"),
+so MIMIC's full ingest path is exercised. The channels are split across several
+worker processes, each with its own MQTT connection, and a summary of the
+achieved publish rate is printed at the end.
+
+    python example/load_generator.py --copies 20 --rate 500 --processes 4 --duration 30
+    python example/load_generator.py --channel-rate voltage_ch1=2000 --payload-size 64
+
+Use --write-config to save a YAML that lists the copies, so MIMIC can be
+started on exactly the topics that are being generated.
+"""
+import argparse
+import heapq
+import json
+import multiprocessing as mp
+import os
+import random
+import struct
+import time
+import yaml
+
+YAML_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'devices_configuration.yaml')
+MAX_LAG = 1.0  # seconds behind schedule before a channel skips the missed samples
+REPORT_INTERVAL = 5.0  # seconds between progress lines
+
+def load_config(path):
+    if not os.path.exists(path):
+        print(f"Error: {path} not found.")
+        exit(1)
+    with open(path, 'r') as file:
+        return yaml.safe_load(file)
+
+def copy_base_topic(base_topic, index):
+    return base_topic if index == 0 else f"{base_topic}_sim{index}"
+
+def expand_devices(config, copies):
+    """Returns the device list with `copies` instances of every device, each under its own base topic."""
+    devices = []
+    for device in config.get('devices', []):
+        if not device.get('mqtt_base_topic'):
+            continue
+        for i in range(copies):
+            clone = dict(device)
+            clone['id'] = device.get('id', 'device') if i == 0 else f"{device.get('id', 'device')}_sim{i}"
+            clone['name'] = device.get('name', clone['id']) if i == 0 else f"{device.get('name', clone['id'])} #{i}"
+            clone['mqtt_base_topic'] = copy_base_topic(device['mqtt_base_topic'], i)
+            devices.append(clone)
+    return devices
+
+def build_channels(devices, rate, channel_rates):
+    """
+    Returns (topic, payload format, rate) for every status channel.
+    channel_rates overrides rate per channel key.
+    """
+    channels = []
+    for device in devices:
+        for channel in device.get('channels', []):
+            if 'status_suffix' not in channel:
+                continue
+            channel_rate = channel_rates.get(channel.get('key'), rate)
+            if channel_rate <= 0:
+                continue
+            topic = f"{device['mqtt_base_topic']}/{channel['status_suffix']}"
+            channels.append((topic, payload_format(device, channel), channel_rate))
+    return channels
+
+def payload_format(device, channel):
+    """
+    Returns (value type, codec options) for the payloads MIMIC expects on a
+    channel: its YAML `codec`, or for wavemeters (base topic containing "WM")
+    the "(timestamp, frequency)" csv MIMIC decodes them with by default.
+    """
+    wavemeter = 'WM' in device['mqtt_base_topic']
+    spec = channel.get('codec')
+    if spec is None and wavemeter:
+        spec = {'type': 'csv', 'index': 1}
+    if isinstance(spec, str):
+        spec = {'type': spec}
+    data_type = 'wm_freq' if wavemeter else channel.get('type')
+    return data_type, tuple(sorted((spec or {}).items()))
+
+def generate_value(data_type):
+    """Generates a random value based on the YAML type definition."""
+    if data_type == 'float':
+        return f"{random.uniform(0.0, 24.0):.2f}"
+    elif data_type == 'wm_freq':
+        return f"{random.gauss(384.228300, 0.000_001):.7f}" # THz, MHz-level scatter
+    elif data_type == 'integer':
+        return str(random.randint(0, 100))
+    elif data_type == 'boolean':
+        return random.choice(("true", "false"))
+    return "0"
+
+def encode_value(value, codec):
+    """Wraps a generated value the way the channel's codec decodes it."""
+    options = dict(codec)
+    kind = options.get('type')
+    if kind == 'csv':
+        fields = [f"{time.time():.3f}"] * (int(options.get('index', 0)) + 1)
+        fields[-1] = value
+        return f"({(options.get('separator', ',') + ' ').join(fields)})".encode()
+    if kind == 'json':
+        document = value if options.get('cast') == 'str' else json.loads(value)
+        for key in reversed([k for k in str(options.get('path', '')).split('.') if k != '']):
+            if key.lstrip('-').isdigit():
+                document = [None] * int(key) + [document]
+            else:
+                document = {key: document}
+        return json.dumps(document).encode()
+    if kind == 'struct':
+        layout = struct.Struct(options.get('format', '<d'))
+        fields = list(layout.unpack(bytes(layout.size)))
+        index = int(options.get('index', 0))
+        number = float(value) if value not in ("true", "false") else value == "true"
+        fields[index] = type(fields[index])(number)
+        return layout.pack(*fields)
+    return value.encode()
+
+def make_payload(payload_format, payload_size):
+    """Encodes a value, padded with trailing spaces up to payload_size bytes (MIMIC codecs strip them)."""
+    data_type, codec = payload_format
+    payload = encode_value(generate_value(data_type), codec)
+    if len(payload) < payload_size:
+        payload += b" " * (payload_size - len(payload))
+    return payload
+
+def run_worker(worker_id, channels, args, results):
+    import paho.mqtt.client as mqtt
+
+    client = mqtt.Client(client_id=f"MIMIC_LoadGen_{os.getpid()}_{worker_id}")
+    client.connect(args.broker, args.port, 60)
+    client.loop_start()
+
+    # Payloads are pre-generated so the loop measures publishing, not random()
+    pool = {t: [make_payload(t, args.payload_size) for _ in range(64)] for t in {c[1] for c in channels}}
+
+    start = time.perf_counter()
+    end = start + args.duration
+    schedule = [(start + random.random() / r, i, 1.0 / r) for i, (_, _, r) in enumerate(channels)]
+    heapq.heapify(schedule)
+    published = failed = skipped = sent_bytes = 0
+    max_lag = 0.0
+
+    try:
+        while schedule:
+            due, i, interval = schedule[0]
+            now = time.perf_counter()
+            if now >= end:
+                break
+            if due > now:
+                time.sleep(min(due - now, end - now))
+                continue
+
+            topic, payload_format, _ = channels[i]
+            values = pool[payload_format]
+            payload = values[published % len(values)]
+            info = client.publish(topic, payload, qos=args.qos)
+            if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                published += 1
+                sent_bytes += len(payload)
+            else:
+                failed += 1
+
+            lag = now - due
+            max_lag = max(max_lag, lag)
+            due += interval
+            if lag > MAX_LAG:
+                # Too far behind: drop the backlog instead of bursting to catch up
+                missed = int(lag / interval)
+                skipped += missed
+                due += missed * interval
+            heapq.heapreplace(schedule, (due, i, interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        elapsed = time.perf_counter() - start
+        client.loop_stop()
+        client.disconnect()
+        results.put({
+            'worker': worker_id,
+            'channels': len(channels),
+            'target_rate': sum(c[2] for c in channels),
+            'published': published,
+            'bytes': sent_bytes,
+            'failed': failed,
+            'skipped': skipped,
+            'max_lag': max_lag,
+            'elapsed': elapsed,
+        })
+
+def write_config(path, config, devices):
+    out = dict(config)
+    out['devices'] = devices
+    with open(path, 'w') as file:
+        yaml.safe_dump(out, file, sort_keys=False)
+    print(f"Wrote {len(devices)} devices to {path}")
+
+def parse_channel_rates(items):
+    rates = {}
+    for item in items or []:
+        key, _, value = item.partition('=')
+        rates[key] = float(value)
+    return rates
+
+def print_summary(reports, target_rate):
+    reports = sorted(reports, key=lambda r: r['worker'])
+    print("-" * 30)
+    for r in reports:
+        rate = r['published'] / r['elapsed'] if r['elapsed'] else 0.0
+        print(f"Worker {r['worker']}: {r['channels']} channels, {rate:,.0f} / {r['target_rate']:,.0f} msg/s, "
+              f"failed {r['failed']}, skipped {r['skipped']}, max lag {r['max_lag'] * 1000:.1f} ms")
+    published = sum(r['published'] for r in reports)
+    elapsed = max((r['elapsed'] for r in reports), default=0.0)
+    achieved = published / elapsed if elapsed else 0.0
+    print("-" * 30)
+    print(f"Published {published:,} messages in {elapsed:.1f} s")
+    print(f"Achieved rate: {achieved:,.0f} msg/s of {target_rate:,.0f} msg/s target "
+          f"({100 * achieved / target_rate if target_rate else 0:.1f}%), "
+          f"{sum(r['bytes'] for r in reports) / elapsed / 1e6 if elapsed else 0:.2f} MB/s payload")
+    print(f"Failed: {sum(r['failed'] for r in reports)}, skipped (behind schedule): {sum(r['skipped'] for r in reports)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default=YAML_FILE, help="device YAML to simulate")
+    parser.add_argument("--broker", default=None, help="broker address (default: from the YAML)")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--copies", type=int, default=1, help="instances of every device")
+    parser.add_argument("--rate", type=float, default=10.0, help="publishes per second per channel")
+    parser.add_argument("--channel-rate", action="append", metavar="KEY=HZ",
+                        help="rate override for a channel key, 0 disables it (repeatable)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--payload-size", type=int, default=0, help="pad payloads to this many bytes")
+    parser.add_argument("--qos", type=int, default=0, choices=[0, 1, 2])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--write-config", metavar="PATH", help="save a YAML with the device copies and exit")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    args.broker = args.broker or config.get('broker', 'localhost')
+    devices = expand_devices(config, max(args.copies, 1))
+
+    if args.write_config:
+        write_config(args.write_config, config, devices)
+        return
+
+    channels = build_channels(devices, args.rate, parse_channel_rates(args.channel_rate))
+    if not channels:
+        print("No status channels to publish.")
+        return
+
+    # Deal channels round-robin, heaviest first, so workers get similar rates
+    n_workers = max(1, min(args.processes, len(channels)))
+    shares = [[] for _ in range(n_workers)]
+    load = [0.0] * n_workers
+    for channel in sorted(channels, key=lambda c: -c[2]):
+        w = load.index(min(load))
+        shares[w].append(channel)
+        load[w] += channel[2]
+    target_rate = sum(load)
+
+    print(f"Simulating {len(devices)} devices, {len(channels)} channels, target {target_rate:,.0f} msg/s "
+          f"on {args.broker}:{args.port} with {n_workers} processes for {args.duration:.0f} s...")
+
+    results = mp.Queue()
+    workers = [mp.Process(target=run_worker, args=(i, share, args, results), daemon=True)
+               for i, share in enumerate(shares)]
+    for w in workers:
+        w.start()
+
+    reports = []
+    started = time.time()
+    try:
+        while len(reports) < n_workers:
+            try:
+                reports.append(results.get(timeout=REPORT_INTERVAL))
+            except Exception:
+                if not any(w.is_alive() for w in workers):
+                    break
+                print(f"... {time.time() - started:.0f} s")
+    except KeyboardInterrupt:
+        print("\nStopping load generator...")
+        while len(reports) < n_workers:
+            try:
+                reports.append(results.get(timeout=2.0))
+            except Exception:
+                break
+    for w in workers:
+        w.join(timeout=2)
+
+    print_summary(reports, target_rate)
+
+if __name__ == "__main__":
+    main()
@@ -708,6 +708,30 @@ class Style:
             }}
         '''
 
+        connection_connecting = f'''
+            QLabel {{
+                font-size: 11px;
+                color: {Palette.STATUS_YELLOW};
+                padding: 4px;
+            }}
+        '''
+
+        connection_connected = f'''
+            QLabel {{
+                font-size: 11px;
+                color: {Palette.STATUS_GREEN};
+                padding: 4px;
+            }}
+        '''
+
+        connection_offline = f'''
+            QLabel {{
+                font-size: 11px;
+                color: {Palette.STATUS_RED};
+                padding: 4px;
+            }}
+        '''
+
     class Scroll:
         combined = """
             QScrollArea { background: transparent; border: none; }
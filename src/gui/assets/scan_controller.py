@@ -2,15 +2,50 @@ import os
 import csv
 import time
 import datetime
-import itertools
+import queue
+import threading
 from PyQt6.QtCore import QThread, pyqtSignal
+from src.gui.assets.scan_plan import ScanPlan
+from src.gui.storage.latest_values import latest
+
+FLUSH_ROWS = 100        # rows written between flushes of the scan file
+FLUSH_SECONDS = 1.0     # longest time a written row stays in the file buffer
+QUEUE_SIZE = 10_000     # rows waiting for the writer before log() has to wait
+STABILITY_TIMEOUT = 60  # seconds to wait for a wavemeter axis to become stable
+FRESH_TIMEOUT = 5.0     # seconds to wait for readbacks newer than the last move
+_CLOSE = object()
+
 
 class DataLogger:
-    def __init__(self, directory="data"):
+    """
+    CSV file of a scan, written by a background thread.
+
+    log() only queues the row; the writer thread keeps the file open and
+    flushes it every flush_rows rows or flush_seconds seconds, with an fsync
+    if `fsync` is set. When the disk falls queue_size rows behind, log() waits
+    for room rather than dropping data; stats() reports how often and how long.
+    The flush policy comes from the `scan_log` section of the device config.
+    """
+
+    def __init__(self, directory="data", flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS,
+                 fsync=False, queue_size=QUEUE_SIZE):
         self.directory = directory
+        self.flush_rows = max(int(flush_rows), 1)
+        self.flush_seconds = float(flush_seconds)
+        self.fsync = bool(fsync)
+        self.queue_size = max(int(queue_size), 1)
         self._ensure_directory()
         self.filename = self._generate_filename()
         self.headers = []
+        self.error = None
+        self.rows_logged = 0
+        self.rows_written = 0
+        self.max_backlog = 0
+        self.stalls = 0         # log() calls that found the queue full
+        self.stall_time = 0.0   # seconds spent waiting in those calls
+        self.flushes = 0
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._thread = None
 
     def _ensure_directory(self):
         if not os.path.exists(self.directory):
@@ -26,16 +61,91 @@ class DataLogger:
 
     def init_log(self, headers, comments=""):
         self.headers = headers
-        with open(self.filename, 'w', newline='') as f:
+        self._thread = threading.Thread(target=self._run, args=(comments,), name="DataLogger", daemon=True)
+        self._thread.start()
+
+    def log(self, data):
+        if self.error is not None:
+            raise OSError(f"Writing {self.filename} failed: {self.error}")
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            self.stalls += 1
+            t0 = time.perf_counter()
+            self._queue.put(data)
+            self.stall_time += time.perf_counter() - t0
+        self.rows_logged += 1
+        self.max_backlog = max(self.max_backlog, self._queue.qsize())
+
+    @property
+    def backlog(self):
+        """Rows queued but not written yet."""
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            'rows_logged': self.rows_logged,
+            'rows_written': self.rows_written,
+            'backlog': self.backlog,
+            'max_backlog': self.max_backlog,
+            'stalls': self.stalls,
+            'stall_time': self.stall_time,
+            'flushes': self.flushes,
+        }
+
+    def close(self):
+        """Writes the remaining rows and closes the file."""
+        if self._thread is None:
+            return
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, comments):
+        f = None
+        try:
+            f = open(self.filename, 'w', newline='')
             if comments:
                 f.write(f"# Comments: {comments}\n")
             writer = csv.DictWriter(f, fieldnames=self.headers)
             writer.writeheader()
+            unflushed = 0
+            last_flush = time.monotonic()
+            while True:
+                timeout = max(last_flush + self.flush_seconds - time.monotonic(), 0) if unflushed else None
+                try:
+                    row = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    row = None
+                if row is _CLOSE:
+                    break
+                if row is not None:
+                    writer.writerow(row)
+                    self.rows_written += 1
+                    unflushed += 1
+                if unflushed and (unflushed >= self.flush_rows
+                                  or time.monotonic() - last_flush >= self.flush_seconds):
+                    self._flush(f)
+                    unflushed = 0
+                    last_flush = time.monotonic()
+        except Exception as e:
+            self.error = e
+            print(f"[DataLogger] Write failed: {e}")
+            # Keep draining so log() never waits on a writer that is gone
+            while self._queue.get() is not _CLOSE:
+                pass
+        finally:
+            if f is not None:
+                try:
+                    self._flush(f)
+                finally:
+                    f.close()
 
-    def log(self, data):
-        with open(self.filename, 'a', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=self.headers)
-            writer.writerow(data)
+    def _flush(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+        self.flushes += 1
 
 class ScanWorker(QThread):
     # Signals
@@ -51,103 +161,146 @@ class ScanWorker(QThread):
         self.is_running = True
         self.is_paused = False
         self.logger = None
+        self.columns = None     # [(row key, Parameter)], built on the first snapshot
 
     def run(self):
+        finished = False
         try:
             axes = self.config['axes']
             delay = self.config['delay']
             repeats = self.config['repeats']
+            settle = self.config.get('settle', 'delay')
+            # Axes that report a readback: with fresh_readback, rows wait for a value received after the move
+            fresh = [axis['param'] for axis in axes if axis['param'] in latest] \
+                if self.config.get('fresh_readback') else []
+
+            order = self.config.get('order', 'raster')
+            plan = ScanPlan(axes, repeats, order)
+            total_points = len(plan)
+            start_index = int(self.config.get('start_index', 0))
+            print(f"[Scan] {total_points} points in {order} order, estimated travel {plan.travel_cost():.4g}")
 
-            axis_ranges = []
-            for axis in axes:
-                start = float(axis['start'])
-                stop = float(axis['stop'])
-                steps = int(axis['steps'])
-
-                if steps <= 1:
-                    vals = [start]
-                else:
-                    step_size = (stop - start) / (steps - 1)
-                    vals = [start + i * step_size for i in range(steps)]
-
-                if repeats > 1:
-                    base_vals = list(vals)
-                    full_vals = list(base_vals)
-                    current_dir = 1
-                    for r in range(repeats - 1):
-                        if current_dir == 1:
-                            full_vals.extend(base_vals[-2::-1])
-                            current_dir = -1
-                        else:
-                            full_vals.extend(base_vals[1:])
-                            current_dir = 1
-                    axis_ranges.append(full_vals)
-                else:
-                    axis_ranges.append(vals)
-
-            scan_points = list(itertools.product(*axis_ranges))
-            total_points = len(scan_points)
-
-            self.status_update.emit(f"Starting scan with {total_points} points...")
-
-            self.logger = DataLogger()
+            if start_index:
+                self.status_update.emit(f"Starting scan at point {start_index + 1} of {total_points}...")
+            else:
+                self.status_update.emit(f"Starting scan with {total_points} points...")
+
+            self.logger = DataLogger(**self.config.get('log', {}))
             dummy_data = self.snapshot_instruments()
             self.logger.init_log(list(dummy_data.keys()), self.config.get('comments', ''))
             self.status_update.emit(f"Saving to {self.logger.filename}")
 
-            for idx, point in enumerate(scan_points):
+            for idx, point in plan.points(start_index):
                 if not self.is_running: break
 
                 while self.is_paused:
                     self.msleep(100)
                     if not self.is_running: break
 
+                settling = []
+                unsettled = False   # an axis moved without a readback to wait for
+                moved_at = time.time()
                 for i, val in enumerate(point):
                     param = axes[i]['param']
-                    if param.set_cmd:
+                    pending = None
+                    if settle == 'readback' and param.settle_cmd:
+                        pending = param.settle_cmd(val)
+                    elif param.set_cmd:
                         param.set_cmd(val)
+                    if pending is not None:
+                        settling.append((param, pending))
+                    elif param.set_cmd:
+                        unsettled = True
+                    if param.set_cmd:
                         param.current_value = val
 
-                if delay > 0:
+                if settling:
+                    self.wait_for_settle(settling)
+                if delay > 0 and (settle != 'readback' or unsettled):
                     time.sleep(delay)
 
                 for axis in axes:
-                    if axis['param'].param_type == 'wm_freq':
+                    if axis['param'].param_type == 'wm_freq' or axis['param'].detector is not None:
                         self.status_update.emit(f"Waiting for stability: {axis['param'].name}")
                         self.wait_for_stability(axis['param'])
 
-                data_row = self.snapshot_instruments()
+                data_row = self.snapshot_instruments({param: moved_at for param in fresh} if fresh else None)
 
+                stalls = self.logger.stalls
                 self.logger.log(data_row)
+                if self.logger.stalls != stalls:
+                    self.status_update.emit(f"Disk is behind: {self.logger.backlog} rows waiting to be saved")
                 self.data_point_ready.emit(data_row)
                 self.progress_update.emit(idx + 1, total_points)
 
-            self.status_update.emit("Scan Finished.")
-            self.scan_finished.emit()
+            finished = True
 
         except Exception as e:
             self.status_update.emit(f"Error: {str(e)}")
             print(f"Scan Error: {e}")
+        finally:
+            # The only place the file gets closed, whether the scan ended, was stopped or failed
+            if self.logger is not None:
+                self.logger.close()
+                stats = self.logger.stats()
+                if stats['stalls']:
+                    print(f"[DataLogger] {stats['stalls']} rows waited {stats['stall_time']:.2f} s for the disk "
+                          f"(backlog up to {stats['max_backlog']})")
+        # Reported once the file is complete on disk
+        if finished:
+            self.status_update.emit("Scan Finished.")
+            self.scan_finished.emit()
 
-    def wait_for_stability(self, param):
-        self.msleep(1200)
-
-        timeout = 60 # seconds
-        start_t = time.time()
-        while time.time() - start_t < timeout:
-            if not self.is_running: return
-            if param.stable:
+    def wait_for_settle(self, settling):
+        """Waits until every (param, PendingSettle) settled or timed out; they settle in parallel."""
+        for param, pending in settling:
+            while self.is_running and pending.wait(0.1) is None and not pending.expired:
+                pass
+            if not self.is_running:
                 return
-            self.msleep(100)
-        self.status_update.emit(f"Timeout waiting for {param.name}")
+            if not pending.settled:
+                self.status_update.emit(f"Timeout waiting for {param.name} to settle")
+
+    def wait_for_stability(self, param):
+        """Blocks until the parameter has been stable for its stability_hold, or STABILITY_TIMEOUT."""
+        if not param.wait_stable(timeout=STABILITY_TIMEOUT, cancelled=lambda: not self.is_running):
+            if self.is_running:
+                self.status_update.emit(f"Timeout waiting for {param.name}")
 
-    def snapshot_instruments(self):
+    def snapshot_instruments(self, fresh_since=None):
+        """
+        One row of readings, read atomically from the latest received values.
+        Parameters that never reported (e.g. write-only ones) log the value the
+        scan last set. max_age is the age in seconds of the oldest reading in the
+        row; with the reading_ages option every column also gets a <key>_age
+        column, left empty for parameters that never reported. fresh_since
+        ({param: time}) waits up to FRESH_TIMEOUT for those parameters to report
+        after the given time.
+        """
+        if self.columns is None:
+            self.columns = [(f"{inst.name}_{param.name}", param)
+                            for inst in self.instruments for param in inst.get_all_params()]
+        readings, stale = latest.snapshot([param for _, param in self.columns], fresh_since,
+                                          FRESH_TIMEOUT if fresh_since else 0.0,
+                                          cancelled=lambda: not self.is_running)
+        for param in stale:
+            self.status_update.emit(f"No fresh readback from {param.name}")
         data = {}
         data['timestamp'] = datetime.datetime.now().isoformat()
-        for inst in self.instruments:
-            for param in inst.get_all_params():
-                key = f"{inst.name}_{param.name}"
+        max_age = 0.0
+        ages = {}
+        for key, param in self.columns:
+            reading = readings.get(param)
+            if reading is None:
                 data[key] = param.current_value
+                ages[f"{key}_age"] = ""
+            else:
+                data[key] = reading.value
+                max_age = max(max_age, reading.age)
+                ages[f"{key}_age"] = round(reading.age, 6)
+        data['max_age'] = round(max_age, 6)
+        if self.config.get('reading_ages'):
+            data.update(ages)
         return data
 
     def stop(self):
@@ -0,0 +1,266 @@
+"""
+Scan points computed from their index instead of stored in a list.
+
+A scan is the product of its axes, the last axis changing fastest. With
+repeats, each axis goes back and forth over its values: forward, backward
+without repeating the turning point, forward again, and so on. Point k is
+found by splitting k into one digit per axis (mixed radix), and each digit
+into a position on the axis' triangle wave, so the plan takes O(axes) memory
+whatever its length and any point can be reached directly.
+
+The order in which the grid is visited is selectable:
+
+  - "raster": itertools.product order; outer axes fly back to their start
+    after every sweep of the axes inside them;
+  - "serpentine": every nested axis reverses direction on alternate sweeps,
+    so no axis ever flies back (still computed from the index);
+  - "hilbert": along a Hilbert curve through the grid, which keeps all axes
+    moving in small steps;
+  - "nearest": greedy nearest neighbour, where moving an axis by one unit
+    costs its `weight`.
+
+The last two precompute the visiting order of the grid without repeats, one
+int64 per point, and repeat the whole path instead of each axis: forward,
+backward without repeating the turning point, and so on, so that no point is
+visited twice in a row.
+travel_cost() estimates the weighted distance all axes travel in a plan.
+"""
+import numpy as np
+
+ORDERS = ("raster", "serpentine", "hilbert", "nearest")
+ORDER_LABELS = {
+    "raster": "Raster",
+    "serpentine": "Serpentine",
+    "hilbert": "Hilbert Curve",
+    "nearest": "Nearest Neighbour",
+}
+HILBERT_MAX_POINTS = 4_000_000
+NEAREST_MAX_POINTS = 5_000
+
+
+class ScanAxis:
+    """The values one axis visits, `repeats` times back and forth."""
+
+    def __init__(self, start, stop, steps, repeats=1):
+        self.start = float(start)
+        self.stop = float(stop)
+        self.steps = max(int(steps), 1)
+        self.repeats = max(int(repeats), 1)
+        self.step_size = (self.stop - self.start) / (self.steps - 1) if self.steps > 1 else 0.0
+        self.length = 1 if self.steps == 1 else self.steps + (self.repeats - 1) * (self.steps - 1)
+
+    def __len__(self):
+        return self.length
+
+    def position(self, j):
+        """Index into the base values of the j-th entry of the repeated sequence."""
+        if self.steps == 1:
+            return 0
+        period = self.steps - 1
+        j %= 2 * period
+        return j if j <= period else 2 * period - j
+
+    def value_at(self, i):
+        return self.start + i * self.step_size
+
+    def __getitem__(self, j):
+        if j < 0:
+            j += self.length
+        if not 0 <= j < self.length:
+            raise IndexError("scan axis index out of range")
+        return self.value_at(self.position(j))
+
+
+class ScanPlan:
+    """
+    Lazy, indexable sequence of scan points (tuples, one value per axis), in
+    the order selected by `order`. Axes are dicts with start, stop, steps and
+    an optional move-cost weight.
+    """
+
+    def __init__(self, axes, repeats=1, order="raster"):
+        if order not in ORDERS:
+            raise ValueError(f"Unknown scan order '{order}'")
+        self.axes = [ScanAxis(a['start'], a['stop'], a['steps'], repeats) for a in axes]
+        self.weights = [float(a.get('weight', 1.0)) for a in axes]
+        self.order = order
+        self._length = 1
+        for axis in self.axes:
+            self._length *= len(axis)
+        # Axis i completes one sweep every self._blocks[i] points
+        self._blocks = []
+        block = 1
+        for axis in reversed(self.axes):
+            block *= len(axis)
+            self._blocks.insert(0, block)
+        self._permutation = None
+        self._visits = None     # the repeated path over self._permutation
+        if order in ("hilbert", "nearest") and len(self.axes) > 1:
+            base = 1
+            for axis in self.axes:
+                base *= axis.steps
+            self._base_length = base
+            self._permutation = self._hilbert_order() if order == "hilbert" else self._nearest_order()
+            self._visits = ScanAxis(0, base - 1, base, repeats)
+            self._length = len(self._visits)
+
+    def __len__(self):
+        return self._length
+
+    def _raster_digits(self, k):
+        digits = [0] * len(self.axes)
+        for i in range(len(self.axes) - 1, -1, -1):
+            k, digits[i] = divmod(k, len(self.axes[i]))
+        return digits
+
+    def digits(self, k):
+        """Per-axis indices of point k."""
+        if self._permutation is not None:
+            # Indices below an axis' steps are the same in the repeated sequence
+            return self._base_digits(int(self._permutation[self._visits.position(k)]))
+        digits = self._raster_digits(k)
+        if self.order == "serpentine":
+            for i, axis in enumerate(self.axes):
+                if (k // self._blocks[i]) % 2:
+                    digits[i] = len(axis) - 1 - digits[i]
+        return digits
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += self._length
+        if not 0 <= k < self._length:
+            raise IndexError("scan point index out of range")
+        return tuple(axis[j] for axis, j in zip(self.axes, self.digits(k)))
+
+    def __iter__(self):
+        return self.points()
+
+    def points(self, start=0):
+        """Yields (index, point) from point `start` on."""
+        if start < 0:
+            start += self._length
+        if not 0 <= start < self._length:
+            return
+        if self.order != "raster" and len(self.axes) > 1:
+            for k in range(start, self._length):
+                yield k, self[k]
+            return
+        digits = self.digits(start)
+        values = [axis[j] for axis, j in zip(self.axes, digits)]
+        last = len(self.axes) - 1
+        for k in range(start, self._length):
+            yield k, tuple(values)
+            # Odometer step: the last axis moves every point, carrying into the ones before it
+            i = last
+            while i >= 0:
+                digits[i] += 1
+                if digits[i] < len(self.axes[i]):
+                    values[i] = self.axes[i][digits[i]]
+                    break
+                digits[i] = 0
+                values[i] = self.axes[i][0]
+                i -= 1
+
+    # --- ordering ---
+
+    def _axis_values(self):
+        return [np.array([axis[j] for j in range(len(axis))]) for axis in self.axes]
+
+    def _base_values(self):
+        return [np.array([axis.value_at(i) for i in range(axis.steps)]) for axis in self.axes]
+
+    def _base_digits(self, k):
+        digits = [0] * len(self.axes)
+        for i in range(len(self.axes) - 1, -1, -1):
+            k, digits[i] = divmod(k, self.axes[i].steps)
+        return digits
+
+    def _grid_digits(self):
+        """Digits of every point of the grid without repeats in raster order, one row per axis."""
+        return np.indices([axis.steps for axis in self.axes]).reshape(len(self.axes), -1)
+
+    def _hilbert_order(self):
+        if self._base_length > HILBERT_MAX_POINTS:
+            raise ValueError(f"Hilbert order is limited to {HILBERT_MAX_POINTS} points")
+        digits = self._grid_digits().astype(np.int64)
+        n = len(self.axes)
+        bits = max(int(max(axis.steps for axis in self.axes) - 1).bit_length(), 1)
+        if n * bits > 63:
+            raise ValueError("Too many axes or steps for Hilbert order")
+        return np.argsort(hilbert_keys(digits, bits), kind='stable')
+
+    def _nearest_order(self):
+        n = self._base_length
+        if n > NEAREST_MAX_POINTS:
+            raise ValueError(f"Nearest-neighbour order is limited to {NEAREST_MAX_POINTS} points")
+        values = self._base_values()
+        digits = self._grid_digits()
+        coords = np.stack([values[i][digits[i]] * self.weights[i] for i in range(len(self.axes))], axis=1)
+        visited = np.zeros(n, bool)
+        order = np.empty(n, np.int64)
+        current = 0
+        for k in range(n):
+            order[k] = current
+            visited[current] = True
+            if k + 1 == n:
+                break
+            cost = np.abs(coords - coords[current]).sum(axis=1)
+            cost[visited] = np.inf
+            current = int(np.argmin(cost))
+        return order
+
+    def travel_cost(self):
+        """
+        Sum over all moves between consecutive points of weight * |change| of
+        every axis, in the units of the axes' values.
+        """
+        if self._permutation is not None:
+            values = self._base_values()
+            digits = np.stack(np.unravel_index(self._permutation, [a.steps for a in self.axes]))
+            path = sum(w * np.abs(np.diff(v[d])).sum() for w, v, d in zip(self.weights, values, digits))
+            # Every repeat walks the same path, alternately backwards
+            return float(path * (len(self._visits) - 1) / max(self._base_length - 1, 1))
+        values = self._axis_values()
+        total = 0.0
+        for i, (weight, v) in enumerate(zip(self.weights, values)):
+            sweeps = self._length // self._blocks[i]
+            sweep = np.abs(np.diff(v)).sum()
+            flyback = abs(v[-1] - v[0]) if self.order == "raster" else 0.0
+            total += weight * (sweeps * sweep + (sweeps - 1) * flyback)
+        return float(total)
+
+
+def hilbert_keys(coords, bits):
+    """
+    Position along the Hilbert curve of every column of `coords` (an int array
+    of n rows, one per dimension, values < 2**bits), after Skilling,
+    "Programming the Hilbert curve" (2004).
+    """
+    x = [row.copy() for row in coords]
+    n = len(x)
+    # Inverse undo
+    q = 1 << (bits - 1)
+    while q > 1:
+        p = q - 1
+        for i in range(n):
+            high = (x[i] & q) != 0
+            t = (x[0] ^ x[i]) & p
+            x[0] = np.where(high, x[0] ^ p, x[0] ^ t)
+            x[i] = np.where(high, x[i], x[i] ^ t)
+        q >>= 1
+    # Gray encode
+    for i in range(1, n):
+        x[i] ^= x[i - 1]
+    t = np.zeros_like(x[0])
+    q = 1 << (bits - 1)
+    while q > 1:
+        t = np.where((x[n - 1] & q) != 0, t ^ (q - 1), t)
+        q >>= 1
+    for i in range(n):
+        x[i] ^= t
+    # Interleave the transposed bits, most significant first
+    key = np.zeros_like(x[0])
+    for b in range(bits - 1, -1, -1):
+        for i in range(n):
+            key = (key << 1) | ((x[i] >> b) & 1)
+    return key
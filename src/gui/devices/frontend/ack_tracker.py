@@ -0,0 +1,144 @@
+import math
+import threading
+import time
+from concurrent.futures import Future
+
+
+class LatencyHistogram:
+    """
+    Log-spaced latency histogram: BUCKETS_PER_DECADE buckets per factor of ten
+    between MIN_LATENCY and MAX_LATENCY seconds, plus count/sum/min/max.
+    """
+    MIN_LATENCY = 1e-4
+    MAX_LATENCY = 100.0
+    BUCKETS_PER_DECADE = 10
+
+    def __init__(self):
+        decades = math.log10(self.MAX_LATENCY / self.MIN_LATENCY)
+        self.counts = [0] * (int(decades * self.BUCKETS_PER_DECADE) + 2)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _bucket(self, latency):
+        if latency <= self.MIN_LATENCY:
+            return 0
+        index = int(math.log10(latency / self.MIN_LATENCY) * self.BUCKETS_PER_DECADE) + 1
+        return min(index, len(self.counts) - 1)
+
+    def bucket_upper_bound(self, index):
+        return self.MIN_LATENCY * 10 ** (index / self.BUCKETS_PER_DECADE)
+
+    def add(self, latency):
+        self.counts[self._bucket(latency)] += 1
+        self.count += 1
+        self.total += latency
+        self.min = min(self.min, latency)
+        self.max = max(self.max, latency)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (0-100)."""
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100.0
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(self.bucket_upper_bound(index), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'min': self.min if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+class PendingAck:
+    __slots__ = ("target", "tolerance", "sent_at", "future")
+
+    def __init__(self, target, tolerance):
+        self.target = target
+        self.tolerance = tolerance
+        self.sent_at = time.time()
+        self.future = Future()
+
+
+class AckTracker:
+    """
+    Pairs each command with the first status sample of the same parameter
+    that reflects it, and records the round trip per parameter.
+
+    expect() is called right before a command is published and returns a
+    concurrent.futures.Future that resolves to (value, latency) when a
+    matching status arrives. It can be waited on with future.result(timeout),
+    or awaited with asyncio.wrap_future(). A newer command on the same
+    parameter cancels the older one. observe() runs on the network thread for
+    every decoded status sample.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}      # parameter -> PendingAck
+        self.histograms = {}    # parameter -> LatencyHistogram
+        self.timeouts = {}      # parameter -> commands never confirmed
+
+    @staticmethod
+    def matches(value, target, tolerance):
+        if isinstance(target, bool) or isinstance(value, bool):
+            return bool(value) == bool(target)
+        try:
+            value, target = float(value), float(target)
+        except (TypeError, ValueError):
+            return str(value) == str(target)
+        return math.isclose(value, target, rel_tol=1e-9, abs_tol=tolerance or 0.0)
+
+    def expect(self, parameter, target, tolerance=None) -> Future:
+        pending = PendingAck(target, tolerance)
+        with self._lock:
+            previous = self._pending.get(parameter)
+            self._pending[parameter] = pending
+        if previous is not None:
+            previous.future.cancel()
+        return pending.future
+
+    def observe(self, parameter, value, timestamp):
+        if parameter not in self._pending:
+            return
+        with self._lock:
+            pending = self._pending.get(parameter)
+            if pending is None or not self.matches(value, pending.target, pending.tolerance):
+                return
+            del self._pending[parameter]
+            latency = max(timestamp - pending.sent_at, 0.0)
+            self.histograms.setdefault(parameter, LatencyHistogram()).add(latency)
+        pending.future.set_result((value, latency))
+
+    def discard(self, parameter, future):
+        """Forgets a command whose caller gave up waiting, counting it as a timeout."""
+        with self._lock:
+            pending = self._pending.get(parameter)
+            if pending is None or pending.future is not future:
+                return
+            del self._pending[parameter]
+            self.timeouts[parameter] = self.timeouts.get(parameter, 0) + 1
+        future.cancel()
+
+    def wait(self, parameter, future, timeout):
+        """Blocks until the command is confirmed. Returns (value, latency) or None on timeout."""
+        try:
+            return future.result(timeout)
+        except Exception:
+            self.discard(parameter, future)
+            return None
@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+
+@dataclass
+class CommandStats:
+    queued: int = 0
+    dropped: int = 0    # superseded by a newer setpoint before being sent
+    sent: int = 0
+    failed: int = 0
+    latency_total: float = 0.0  # seconds between put() and publish
+    latency_max: float = 0.0
+
+    @property
+    def latency_avg(self):
+        return self.latency_total / self.sent if self.sent else 0.0
+
+    def add(self, other):
+        self.queued += other.queued
+        self.dropped += other.dropped
+        self.sent += other.sent
+        self.failed += other.failed
+        self.latency_total += other.latency_total
+        self.latency_max = max(self.latency_max, other.latency_max)
+
+
+@dataclass
+class TopicSettings:
+    qos: int = 0
+    max_rate: float = 0.0   # commands per second, 0 = unlimited
+    coalesce: bool = True   # keep only the newest pending command
+
+
+class CommandQueue:
+    """
+    Outgoing command pipeline for one MqttHandler.
+
+    put() only records the command and returns, whatever thread calls it (GUI,
+    ScanWorker, scripts). A single background thread publishes the commands,
+    honouring per-topic QoS and max rate. While a topic is waiting for its rate
+    slot, a newer setpoint replaces the pending one (last write wins) unless
+    the topic is configured with coalesce=False.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.settings = {}          # topic -> TopicSettings
+        self.stats = {}             # topic -> CommandStats
+        self._pending = {}          # topic -> deque of (payload, put_time)
+        self._next_allowed = {}     # topic -> earliest time of the next publish
+        self._inflight = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def configure(self, topic, qos=0, max_rate=0.0, coalesce=True):
+        with self._cond:
+            self.settings[topic] = TopicSettings(int(qos), float(max_rate or 0.0), bool(coalesce))
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="MqttCommandQueue", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def put(self, topic, payload):
+        with self._cond:
+            settings = self.settings.get(topic) or TopicSettings()
+            stats = self.stats.setdefault(topic, CommandStats())
+            pending = self._pending.setdefault(topic, deque())
+            if settings.coalesce and pending:
+                stats.dropped += len(pending)
+                pending.clear()
+            pending.append((payload, time.time()))
+            stats.queued += 1
+            self._cond.notify()
+
+    def flush(self, timeout=None):
+        """Blocks until every queued command has been published. Returns False on timeout."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._inflight or any(self._pending.values()):
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def pending(self):
+        with self._cond:
+            return sum(len(p) for p in self._pending.values())
+
+    def total_stats(self):
+        total = CommandStats()
+        with self._cond:
+            for stats in self.stats.values():
+                total.add(stats)
+        return total
+
+    def _next_ready(self, now):
+        """Returns (topic, None) for a topic allowed to publish now, or (None, wait)."""
+        wait = None
+        for topic, pending in self._pending.items():
+            if not pending:
+                continue
+            ready_at = self._next_allowed.get(topic, 0.0)
+            if ready_at <= now:
+                return topic, None
+            if wait is None or ready_at - now < wait:
+                wait = ready_at - now
+        return None, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._running:
+                        return
+                    topic, wait = self._next_ready(time.time())
+                    if topic is not None:
+                        break
+                    self._cond.wait(wait)
+                payload, put_time = self._pending[topic].popleft()
+                # Move the topic to the back so a busy topic cannot starve the others
+                self._pending[topic] = self._pending.pop(topic)
+                self._inflight += 1
+                settings = self.settings.get(topic) or TopicSettings()
+                if settings.max_rate > 0:
+                    self._next_allowed[topic] = time.time() + 1.0 / settings.max_rate
+
+            try:
+                ok = self.handler.publish(topic, payload, qos=settings.qos)
+            except Exception as e:
+                print(f"[MQTT] Publish to {topic} failed: {e}")
+                ok = False
+            latency = time.time() - put_time
+
+            with self._cond:
+                self._inflight -= 1
+                stats = self.stats[topic]
+                if ok:
+                    stats.sent += 1
+                    stats.latency_total += latency
+                    stats.latency_max = max(stats.latency_max, latency)
+                else:
+                    stats.failed += 1
+                self._cond.notify_all()
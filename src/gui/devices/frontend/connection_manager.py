@@ -0,0 +1,52 @@
+import os
+import threading
+from src.gui.devices.frontend.mqtt_handler import MqttHandler
+
+
+class MqttConnectionManager:
+    """
+    Owns one MqttHandler (one paho client, one network thread, one broker
+    session) per broker and hands it out to every device on that broker.
+    Handlers are reference counted and stopped when the last user releases them.
+    If MIMIC_RECORD is set, each new handler records its traffic to that path,
+    formatted with {broker} and {port}, e.g. MIMIC_RECORD=/tmp/{broker}.rec.
+    """
+    _handlers = {}  # (broker, port) -> MqttHandler
+    _users = {}     # (broker, port) -> number of devices holding the handler
+    _lock = threading.Lock()
+
+    @classmethod
+    def acquire(cls, broker="localhost", port=1883):
+        """Returns the shared, started handler for this broker."""
+        key = (broker, port)
+        with cls._lock:
+            handler = cls._handlers.get(key)
+            if handler is None:
+                handler = MqttHandler(broker_address=broker, port=port)
+                record_path = os.environ.get("MIMIC_RECORD")
+                if record_path:
+                    handler.start_recording(record_path.format(broker=broker, port=port))
+                cls._handlers[key] = handler
+                cls._users[key] = 0
+            cls._users[key] += 1
+        handler.start()
+        return handler
+
+    @classmethod
+    def release(cls, handler):
+        """Drops one reference; the last one stops the client."""
+        key = (handler.broker, handler.port)
+        with cls._lock:
+            if cls._handlers.get(key) is not handler:
+                return
+            cls._users[key] -= 1
+            if cls._users[key] > 0:
+                return
+            del cls._handlers[key]
+            del cls._users[key]
+        handler.stop()
+
+    @classmethod
+    def handlers(cls):
+        with cls._lock:
+            return list(cls._handlers.values())
@@ -1,21 +1,21 @@
 from PyQt6.QtCore import QObject, pyqtSignal
-from src.gui.devices.frontend.mqtt_handler import MqttHandler
+from src.gui.devices.frontend.connection_manager import MqttConnectionManager
 
 class GenericMqttDevice(QObject):
     """
     Base class for any frontend device that needs to communicate via MQTT.
+    The underlying MqttHandler is shared by all devices on the same broker.
     """
 
     def __init__(self, topic_base, broker="localhost"):
         super().__init__()
         self.topic_base = topic_base
-        self.mqtt = MqttHandler(broker_address=broker)
-        self.mqtt.start()
+        self.mqtt = MqttConnectionManager.acquire(broker)
 
     def publish_set(self, subtopic, value):
         """Publishes a value to topic_base/subtopic/set"""
         topic = f"{self.topic_base}/{subtopic}/set"
-        self.mqtt.publish(topic, str(value))
+        self.mqtt.commands.put(topic, str(value))
 
     def subscribe_status(self, subtopic, callback):
         """
@@ -23,10 +23,8 @@ class GenericMqttDevice(QObject):
         and connects the callback to the message handler.
         """
         target_topic = f"{self.topic_base}/{subtopic}/status"
+        self.mqtt.router.add(target_topic, lambda t, p: callback(p), device=self)
         self.mqtt.subscribe(target_topic)
-        self.mqtt.message_received.connect(
-            lambda t, p: callback(p) if t == target_topic else None
-        )
 
     def close(self):
-        self.mqtt.stop()
\ No newline at end of file
+        MqttConnectionManager.release(self.mqtt)
\ No newline at end of file
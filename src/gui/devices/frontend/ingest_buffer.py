@@ -0,0 +1,57 @@
+import threading
+from collections import deque
+
+MAX_HISTORY = 10_000 # samples kept per key between two drains; older ones are dropped
+
+
+class IngestBuffer:
+    """
+    Hand-off between the MQTT network thread and the GUI thread.
+
+    The network thread push()es every message; the GUI thread drain()s the
+    buffer in one go on a timer. Per key only the newest message is kept for
+    display (latest value wins), while keys flagged with keep_history also
+    accumulate every (timestamp, payload) sample since the last drain, for
+    plots and logging. That history is capped at max_history samples per key,
+    so a stalled GUI thread costs bounded memory; the oldest samples are
+    dropped and counted in `dropped`.
+    """
+
+    def __init__(self, max_history=MAX_HISTORY):
+        self._lock = threading.Lock()
+        self.max_history = max_history
+        self._latest = {}     # key -> (payload, timestamp)
+        self._history = {}    # key -> deque of (timestamp, payload)
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0      # history samples lost to the cap
+
+    def push(self, key, payload, timestamp, keep_history=False):
+        with self._lock:
+            self._latest[key] = (payload, timestamp)
+            if keep_history:
+                samples = self._history.get(key)
+                if samples is None:
+                    samples = self._history[key] = deque(maxlen=self.max_history)
+                elif len(samples) == self.max_history:
+                    self.dropped += 1
+                samples.append((timestamp, payload))
+            self.received += 1
+
+    def drain(self):
+        """Returns (latest, history) accumulated since the previous call."""
+        with self._lock:
+            if not self._latest:
+                return {}, {}
+            latest, self._latest = self._latest, {}
+            history, self._history = self._history, {}
+            self.delivered += len(latest)
+        return latest, {key: list(samples) for key, samples in history.items()}
+
+    @property
+    def coalesced(self):
+        """Messages that never reached the GUI because a newer one replaced them."""
+        return self.received - self.delivered
+
+    def __len__(self):
+        return len(self._latest)
@@ -0,0 +1,303 @@
+"""
+In-process stand-in for paho.mqtt.client, for tests and benchmarks.
+
+Clients created here talk to an InProcessBroker living in the same Python
+process instead of a network broker. The module exposes the parts of the paho
+client API that MIMIC and its example scripts use (Client, MQTTMessage,
+MQTT_ERR_* codes, v1 callback signatures), so it can be swapped in with
+InitializeMIMIC.configure_mqtt_environment() (set MIMIC_MQTT=inprocess) or
+install().
+
+Brokers support '+' / '#' wildcards and retained messages. Delivery is either
+"sync" (the subscriber's on_message runs inside publish(), useful to measure
+dispatch overhead without thread hand-offs) or "thread" (each client gets its
+own delivery thread, like paho's loop_start()).
+"""
+import itertools
+import queue
+import sys
+import threading
+import time
+from src.gui.devices.frontend.topic_router import TopicRouter, topic_matches
+
+MQTT_ERR_SUCCESS = 0
+MQTT_ERR_NO_CONN = 4
+CONNACK_ACCEPTED = 0
+
+DELIVERY = "thread" # default delivery mode for brokers created by get_broker()
+
+
+class MQTTMessage:
+    __slots__ = ("topic", "payload", "qos", "retain", "mid", "timestamp")
+
+    def __init__(self, topic, payload, qos=0, retain=False, mid=0):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.mid = mid
+        self.timestamp = time.monotonic()
+
+
+class MQTTMessageInfo:
+    def __init__(self, mid, rc=MQTT_ERR_SUCCESS):
+        self.mid = mid
+        self.rc = rc
+
+    def wait_for_publish(self, timeout=None):
+        return None
+
+    def is_published(self):
+        return self.rc == MQTT_ERR_SUCCESS
+
+
+class InProcessBroker:
+    def __init__(self, delivery=DELIVERY):
+        if delivery not in ("sync", "thread"):
+            raise ValueError(f"Unknown delivery mode '{delivery}'")
+        self.delivery = delivery
+        self.router = TopicRouter()
+        self.retained = {}       # topic -> MQTTMessage
+        self._routes = {}        # (client, topic filter) -> Route
+        self._lock = threading.Lock()
+        self._mids = itertools.count(1)
+        self.published = 0
+
+    def subscribe(self, client, topic_filter, qos=0):
+        key = (client, topic_filter)
+        with self._lock:
+            if key not in self._routes:
+                self._routes[key] = self.router.add(topic_filter, client._enqueue, device=client)
+            retained = [m for t, m in self.retained.items() if topic_matches(topic_filter, t)]
+        for msg in retained:
+            client._enqueue(msg.topic, msg)
+
+    def unsubscribe(self, client, topic_filter):
+        with self._lock:
+            route = self._routes.pop((client, topic_filter), None)
+        if route is not None:
+            self.router.remove(route)
+
+    def disconnect(self, client):
+        with self._lock:
+            keys = [k for k in self._routes if k[0] is client]
+            routes = [self._routes.pop(k) for k in keys]
+        for route in routes:
+            self.router.remove(route)
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        mid = next(self._mids)
+        msg = MQTTMessage(topic, payload, qos, False, mid)
+        if retain:
+            with self._lock:
+                if payload:
+                    self.retained[topic] = MQTTMessage(topic, payload, qos, True, mid)
+                else:
+                    self.retained.pop(topic, None)
+        self.published += 1
+        delivered = set()
+        for route in self.router.match(topic):
+            # One copy per client, even with overlapping subscriptions
+            if route.device not in delivered:
+                delivered.add(route.device)
+                route.handler(topic, msg)
+        return mid
+
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def install():
+    """Makes `import paho.mqtt.client` resolve to this module. Call before importing MIMIC modules."""
+    module = sys.modules[__name__]
+    module.client = module
+    module.mqtt = module
+    sys.modules["paho"] = module
+    sys.modules["paho.mqtt"] = module
+    sys.modules["paho.mqtt.client"] = module
+
+
+def get_broker(host="localhost", port=1883, delivery=None):
+    """Returns the broker registered for (host, port), creating it on first use."""
+    with _brokers_lock:
+        broker = _brokers.get((host, port))
+        if broker is None:
+            broker = InProcessBroker(delivery or DELIVERY)
+            _brokers[(host, port)] = broker
+        return broker
+
+
+def reset_brokers():
+    with _brokers_lock:
+        _brokers.clear()
+
+
+def _to_bytes(payload):
+    if payload is None:
+        return b""
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    if isinstance(payload, str):
+        return payload.encode()
+    if isinstance(payload, (int, float)):
+        return str(payload).encode()
+    raise TypeError("payload must be a string, bytearray, int, float or None.")
+
+
+class Client:
+    """Subset of paho.mqtt.client.Client backed by an InProcessBroker."""
+
+    def __init__(self, callback_api_version=None, client_id="", clean_session=None, userdata=None,
+                 *args, **kwargs):
+        self._client_id = client_id
+        self._userdata = userdata
+        self.on_connect = None
+        self.on_connect_fail = None
+        self.on_disconnect = None
+        self.on_message = None
+        self.on_subscribe = None
+        self.on_unsubscribe = None
+        self.on_publish = None
+
+        self._broker = None
+        self._host = None
+        self._port = None
+        self._connected = False
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._running = False
+        self._mids = itertools.count(1)
+
+    # --- connection ---
+
+    def connect(self, host, port=1883, keepalive=60, *args, **kwargs):
+        self.connect_async(host, port, keepalive)
+        return self.reconnect()
+
+    def connect_async(self, host, port=1883, keepalive=60, *args, **kwargs):
+        self._host = host
+        self._port = port
+
+    def reconnect(self):
+        self._broker = get_broker(self._host, self._port)
+        self._connected = True
+        self._callback(self.on_connect, {}, CONNACK_ACCEPTED)
+        return MQTT_ERR_SUCCESS
+
+    def disconnect(self, *args, **kwargs):
+        if not self._connected:
+            return MQTT_ERR_NO_CONN
+        self._connected = False
+        self._broker.disconnect(self)
+        self._callback(self.on_disconnect, 0)
+        return MQTT_ERR_SUCCESS
+
+    def is_connected(self):
+        return self._connected
+
+    def reconnect_delay_set(self, min_delay=1, max_delay=120):
+        pass
+
+    def user_data_set(self, userdata):
+        self._userdata = userdata
+
+    def username_pw_set(self, username, password=None):
+        pass
+
+    def enable_logger(self, logger=None):
+        pass
+
+    # --- network loop ---
+
+    def loop_start(self):
+        if self._running:
+            return MQTT_ERR_SUCCESS
+        self._running = True
+        if self._broker is None and self._host is not None:
+            self.reconnect()
+        if self._broker is not None and self._broker.delivery == "thread":
+            self._thread = threading.Thread(target=self._deliver_loop, name="InProcessMqtt", daemon=True)
+            self._thread.start()
+        return MQTT_ERR_SUCCESS
+
+    def loop_stop(self, force=False):
+        if not self._running:
+            return MQTT_ERR_SUCCESS
+        self._running = False
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=2)
+            self._thread = None
+        return MQTT_ERR_SUCCESS
+
+    def loop(self, timeout=1.0):
+        """Delivers queued messages in the calling thread, waiting up to timeout for the first one."""
+        if self._broker is None and self._host is not None:
+            self.reconnect()
+        try:
+            msg = self._queue.get(timeout=timeout)
+            while True:
+                if msg is not None:
+                    self._callback(self.on_message, msg)
+                msg = self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        return MQTT_ERR_SUCCESS
+
+    def loop_forever(self, *args, **kwargs):
+        self._running = True
+        self._deliver_loop()
+        return MQTT_ERR_SUCCESS
+
+    def _deliver_loop(self):
+        while self._running:
+            msg = self._queue.get()
+            if msg is None:
+                continue
+            self._callback(self.on_message, msg)
+
+    def _enqueue(self, topic, msg):
+        if self._broker.delivery == "sync":
+            self._callback(self.on_message, msg)
+        else:
+            self._queue.put(msg)
+
+    def _callback(self, callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(self, self._userdata, *args)
+        except Exception as e:
+            print(f"[InProcessMqtt] Callback {getattr(callback, '__name__', callback)} failed: {e}")
+
+    # --- pub/sub ---
+
+    def subscribe(self, topic, qos=0, options=None, properties=None):
+        if isinstance(topic, str):
+            topics = [(topic, qos)]
+        elif isinstance(topic, tuple):
+            topics = [topic]
+        else:
+            topics = list(topic)
+        if not self._connected:
+            return MQTT_ERR_NO_CONN, None
+        mid = next(self._mids)
+        for topic_filter, topic_qos in topics:
+            self._broker.subscribe(self, topic_filter, topic_qos)
+        return MQTT_ERR_SUCCESS, mid
+
+    def unsubscribe(self, topic, properties=None):
+        topics = [topic] if isinstance(topic, str) else list(topic)
+        if not self._connected:
+            return MQTT_ERR_NO_CONN, None
+        for topic_filter in topics:
+            self._broker.unsubscribe(self, topic_filter)
+        return MQTT_ERR_SUCCESS, next(self._mids)
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None):
+        if not self._connected:
+            return MQTTMessageInfo(next(self._mids), MQTT_ERR_NO_CONN)
+        mid = self._broker.publish(topic, _to_bytes(payload), qos, retain)
+        return MQTTMessageInfo(mid)
+
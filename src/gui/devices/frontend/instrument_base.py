@@ -1,14 +1,20 @@
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import dataclass, field
 from typing import Callable, Any, Optional
-from PyQt6.QtCore import QObject
+from PyQt6.QtCore import QObject, pyqtSignal
 
-@dataclass
+STABILITY_HOLD = 0.5 # seconds a parameter must stay stable before wait_stable() returns
+
+@dataclass(eq=False)
 class Parameter:
     name: str
     label: str
     param_type: str
     set_cmd: Optional[Callable[[Any], None]] = None
     get_cmd: Optional[Callable[[], Any]] = None
+    confirm_cmd: Optional[Callable[[Any, float], Any]] = None # set and wait for the status to match
+    settle_cmd: Optional[Callable[[Any], Any]] = None # set and return a PendingSettle for the readback
     unit: str = ""
     nickname: str = ""
     _access: str = ""
@@ -21,6 +27,14 @@ class Parameter:
 
     current_value: float = 0.0
     stable: bool = False
+    stable_since: Optional[float] = None # time.monotonic() when `stable` last became True
+    set_time: Optional[float] = None # time.time() of the last command, see mark_set()
+    stability_hold: float = STABILITY_HOLD
+    detector: Any = None # StabilityDetector fed with the status samples, if the channel configures one
+    series: Any = None # RingBuffer with the recent (timestamp, value) history, see timeseries_store
+    move_cost: float = 1.0 # cost of moving this parameter by one unit, used to order scan points
+    stable_event: threading.Event = field(default_factory=threading.Event, repr=False) # set while `stable`
+    _stable_changed: threading.Condition = field(default_factory=threading.Condition, repr=False)
 
     @property
     def update_widget(self):
@@ -126,15 +140,77 @@ class Parameter:
         self.update_current_value(value)
 
 
+    def mark_set(self):
+        """
+        Called when a command is sent: clears the stable flag, and from now on
+        only samples received after this moment can make the parameter stable.
+        """
+        with self._stable_changed:
+            self.set_time = time.time()
+        self.set_stable(False)
+
+    def received_before_set(self, timestamp) -> bool:
+        """True for a sample received before the last command, which says nothing about its result."""
+        return timestamp is not None and self.set_time is not None and timestamp < self.set_time
+
+    def set_stable(self, stable, timestamp=None):
+        """
+        Updates the stability flag and wakes the threads blocked in wait_stable().
+        timestamp is the receive time of the sample the flag was judged on; a
+        sample from before the last command leaves the parameter unstable, so
+        stable_since never starts before the first sample after it.
+        """
+        with self._stable_changed:
+            if self.received_before_set(timestamp):
+                stable = False
+            if not stable:
+                self.stable_since = None
+            elif self.stable_since is None:
+                self.stable_since = time.monotonic()
+            self.stable = bool(stable)
+            if self.stable:
+                self.stable_event.set()
+            else:
+                self.stable_event.clear()
+            self._stable_changed.notify_all()
+
+    def wait_stable(self, hold=None, timeout=None, cancelled=None) -> bool:
+        """
+        Blocks until the parameter has been stable for `hold` seconds (default
+        stability_hold). Wakes on every set_stable(), so it returns within one
+        update of the hold time being reached. Returns False on timeout, or once
+        cancelled() returns True (checked at least every 100 ms).
+        """
+        hold = self.stability_hold if hold is None else hold
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._stable_changed:
+            while True:
+                now = time.monotonic()
+                if self.stable and self.stable_since is not None and now - self.stable_since >= hold:
+                    return True
+                if (cancelled is not None and cancelled()) or (deadline is not None and now >= deadline):
+                    return False
+                waits = []
+                if self.stable and self.stable_since is not None:
+                    waits.append(self.stable_since + hold - now)
+                if deadline is not None:
+                    waits.append(deadline - now)
+                if cancelled is not None:
+                    waits.append(0.1)
+                self._stable_changed.wait(min(waits) if waits else None)
+
     @property
     def scannable(self) -> bool:
         return 'write' in self._access
 
 class InstrumentBase(QObject):
+    connection_changed = pyqtSignal(str) # "connecting", "connected", "offline"
+
     def __init__(self, name):
         super().__init__()
         self.name = name
         self.parameters = {} # Dictionary to store params
+        self.connection_state = "offline"
 
     def add_parameter(self, param: Parameter):
         self.parameters[param.name] = param
@@ -142,5 +218,9 @@ class InstrumentBase(QObject):
     def connect_instrument(self):
         pass
 
+    def set_connection_state(self, state):
+        self.connection_state = state
+        self.connection_changed.emit(state)
+
     def get_all_params(self):
         return self.parameters.values()
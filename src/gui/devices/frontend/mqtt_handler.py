@@ -1,15 +1,48 @@
-from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
 import paho.mqtt.client as mqtt
+import threading
+import random
+import time
 import json
 import uuid
+from src.gui.devices.frontend.topic_router import TopicRouter
+from src.gui.devices.frontend.ingest_buffer import IngestBuffer
+from src.gui.devices.frontend.command_queue import CommandQueue
+from src.gui.devices.frontend.ack_tracker import AckTracker
+from src.gui.devices.frontend.settle_tracker import SettleTracker
+from src.gui.devices.frontend.traffic_recorder import TrafficRecorder
+from src.gui.storage.latest_values import latest
+
+MAX_REFRESH_HZ = 30 # default upper bound on GUI updates per second
+RECONNECT_MIN_DELAY = 1.0  # seconds, first retry
+RECONNECT_MAX_DELAY = 60.0 # seconds, cap of the exponential backoff
 
 class MqttHandler(QObject):
     """
     A unified MQTT Handler that runs in a non-blocking way.
     It manages subscriptions and emits signals when messages arrive.
+
+    A single handler is meant to be shared by every device talking to the
+    same broker (see MqttConnectionManager). Subscriptions are reference
+    counted: the broker only sees the first subscribe and the last unsubscribe
+    of a topic, and the handler restores all of them itself on reconnect.
+    Incoming messages are matched against `router` on the network thread and
+    parked in an IngestBuffer. The GUI thread drains that buffer at most
+    max_refresh_hz times per second, so a flood of messages costs one batch of
+    widget updates per frame instead of one queued event per message.
+    Outgoing commands go through `commands`, a CommandQueue published from its
+    own thread, and `acks` pairs them with the status that confirms them;
+    `settles` waits for the status to settle at the commanded value.
+    start_recording() saves the received traffic to a file that a
+    TrafficReplayer can feed back through ingest().
+
+    start() never blocks: the connection is made by paho's network thread, and
+    failed attempts are retried with exponential backoff and random jitter so
+    that clients do not all hit a restarted broker at the same moment.
     """
     message_received = pyqtSignal(str, str) # topic, payload
     connection_status = pyqtSignal(bool)
+    state_changed = pyqtSignal(str) # "connecting", "connected", "offline"
 
     def __init__(self, broker_address="localhost", port=1883):
         super().__init__()
@@ -20,39 +53,231 @@ class MqttHandler(QObject):
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         self.client.on_disconnect = self.on_disconnect
+        self.client.on_connect_fail = self.on_connect_fail
+
+        self.state = "offline"
+        self.connect_time = None # seconds from start() to the first CONNACK
+        self._start_time = None
+        self._attempts = 0
+
+        self.subscriptions = {} # topic -> number of users
+        self._sub_lock = threading.Lock()
+        self._started = False
+
+        self.commands = CommandQueue(self)
+        self.acks = AckTracker()
+        self.settles = SettleTracker()
+        self.router = TopicRouter()
+        self.buffer = IngestBuffer()
+        self.recorder = None
+        self.decode_errors = 0   # payloads of codec-less channels that were not valid UTF-8
+        self.callback_errors = 0 # messages on_message failed on and dropped
+        self._failing_topics = set() # topics whose failure was already printed
+        self._drain_timer = QTimer(self)
+        self._drain_timer.timeout.connect(self.drain)
+        self.set_max_refresh_rate(MAX_REFRESH_HZ)
+
+    def set_max_refresh_rate(self, hz):
+        """Bounds how often buffered messages are delivered to the GUI."""
+        self.max_refresh_hz = max(float(hz), 0.1)
+        self._drain_timer.setInterval(int(1000 / self.max_refresh_hz))
 
     def start(self):
-        """Connects and starts the non-blocking loop."""
+        """Starts connecting in the background and returns at once. Calling it again is a no-op."""
+        if self._started:
+            return
+        self._started = True
+        self._drain_timer.start()
+        self.commands.start()
+        self._start_time = time.time()
+        self._attempts = 0
+        self._schedule_reconnect()
+        self._set_state("connecting")
         try:
-            self.client.connect(self.broker, self.port)
+            self.client.connect_async(self.broker, self.port)
             self.client.loop_start() # Run in a background thread
         except Exception as e:
             print(f"[MQTT] Connection Error: {e}")
+            self._set_state("offline")
             self.connection_status.emit(False)
 
+    def _set_state(self, state):
+        if state != self.state:
+            self.state = state
+            self.state_changed.emit(state)
+
+    def _schedule_reconnect(self):
+        """
+        Sets the wait before paho's next connection attempt: doubles with every
+        failure up to RECONNECT_MAX_DELAY, randomised between half and full value.
+        """
+        delay = min(RECONNECT_MAX_DELAY, RECONNECT_MIN_DELAY * 2 ** self._attempts)
+        delay = random.uniform(delay / 2, delay)
+        self._attempts += 1
+        self.client.reconnect_delay_set(delay, delay)
+        return delay
+
     def stop(self):
+        if not self._started:
+            return
+        self._started = False
+        self._set_state("offline")
+        self._drain_timer.stop()
+        self.commands.flush(timeout=1)
+        self.commands.stop()
+        self.stop_recording()
         self.client.loop_stop()
         self.client.disconnect()
 
     def subscribe(self, topic):
-        self.client.subscribe(topic)
-        print(f"[MQTT] Subscribed to {topic}")
+        self.subscribe_many([topic])
+
+    def subscribe_many(self, topics):
+        """
+        Subscribes to several topics with a single SUBSCRIBE packet.
+        Topics that are already subscribed only get their user count bumped.
+        """
+        new_topics = []
+        with self._sub_lock:
+            for topic in topics:
+                count = self.subscriptions.get(topic, 0)
+                self.subscriptions[topic] = count + 1
+                if count == 0:
+                    new_topics.append(topic)
+        if not new_topics:
+            return
+        self.client.subscribe([(topic, 0) for topic in new_topics])
+        if len(new_topics) == 1:
+            print(f"[MQTT] Subscribed to {new_topics[0]}")
+        else:
+            print(f"[MQTT] Subscribed to {len(new_topics)} topics")
+
+    def unsubscribe(self, topic):
+        with self._sub_lock:
+            count = self.subscriptions.get(topic, 0)
+            if count <= 1:
+                self.subscriptions.pop(topic, None)
+            else:
+                self.subscriptions[topic] = count - 1
+        if count == 1:
+            self.client.unsubscribe(topic)
+            print(f"[MQTT] Unsubscribed from {topic}")
 
-    def publish(self, topic, payload):
-        self.client.publish(topic, payload)
+    def publish(self, topic, payload, qos=0):
+        """Publishes right away from the calling thread. Returns True if paho accepted it."""
+        info = self.client.publish(topic, payload, qos=qos)
+        return info.rc == mqtt.MQTT_ERR_SUCCESS
 
     def on_connect(self, client, userdata, flags, rc, properties=None):
         if rc == 0:
-            print(f"[MQTT] Connected to {self.broker}")
+            if self.connect_time is None:
+                self.connect_time = time.time() - self._start_time
+                print(f"[MQTT] Connected to {self.broker} in {self.connect_time * 1000:.0f} ms")
+            else:
+                print(f"[MQTT] Connected to {self.broker}")
+            self._attempts = 0
+            self._schedule_reconnect()
+            self._set_state("connected")
+            with self._sub_lock:
+                topics = list(self.subscriptions)
+            if topics:
+                print(f"[MQTT] Restoring {len(topics)} subscriptions on {self.broker}")
+                client.subscribe([(topic, 0) for topic in topics])
             self.connection_status.emit(True)
         else:
             print(f"[MQTT] Connect failed with code {rc}")
             self.connection_status.emit(False)
 
+    def start_recording(self, path):
+        """Appends every message received from now on to a traffic recording."""
+        self.stop_recording()
+        self.recorder = TrafficRecorder(path)
+        print(f"[MQTT] Recording traffic from {self.broker} to {path}")
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+            print(f"[MQTT] Recorded {recorder.messages} messages to {recorder.path}")
+
     def on_message(self, client, userdata, msg):
-        payload = msg.payload.decode()
-        self.message_received.emit(msg.topic, payload)
+        # Runs on the network thread shared by every device on this broker:
+        # an exception escaping here would stop paho's loop for all of them.
+        try:
+            timestamp = time.time()
+            recorder = self.recorder
+            if recorder is not None:
+                recorder.record(msg.topic, msg.payload, timestamp)
+            self.ingest(msg.topic, msg.payload, timestamp)
+        except Exception as e:
+            self.callback_errors += 1
+            if msg.topic not in self._failing_topics:
+                self._failing_topics.add(msg.topic)
+                print(f"[MQTT] Dropped message on {msg.topic}: {e}")
+
+    def ingest(self, topic, raw, timestamp):
+        """Runs on the network thread: match, decode and buffer, nothing else."""
+        routes = self.router.match(topic)
+        if not routes:
+            self.buffer.push((None, topic), raw.decode(errors='replace'), timestamp)
+        for route in routes:
+            codec = route.codec
+            try:
+                value = raw.decode() if codec is None else codec.decode(raw)
+            except Exception:
+                if codec is None:
+                    self.decode_errors += 1
+                else:
+                    codec.errors += 1
+                continue
+            if route.series is not None:
+                route.series.append(timestamp, value)
+            if route.archive is not None:
+                route.archive.append(timestamp, value)
+            if route.detector is not None:
+                route.detector.push(timestamp, value)
+            if route.parameter is not None:
+                latest.update(route.parameter, value, timestamp)
+                self.acks.observe(route.parameter, value, timestamp)
+                self.settles.observe(route.parameter, value, timestamp)
+            self.buffer.push((route, topic), value, timestamp, route.history_handler is not None)
+
+    def drain(self):
+        """
+        Runs on the GUI thread. Delivers the history of every route, then the
+        latest message of every route, then one message_received per topic.
+        """
+        newest, history = self.buffer.drain()
+        if not newest:
+            return
+
+        for (route, topic), samples in history.items():
+            try:
+                route.history_handler(topic, samples)
+            except Exception as e:
+                print(f"[MQTT] History handler for {route.topic} failed: {e}")
+
+        seen = {}
+        for (route, topic), (payload, timestamp) in newest.items():
+            if route is not None:
+                try:
+                    route.handler(topic, payload)
+                except Exception as e:
+                    print(f"[MQTT] Handler for {route.topic} failed: {e}")
+            seen[topic] = payload
+
+        for topic, payload in seen.items():
+            self.message_received.emit(topic, str(payload))
+
+    def on_connect_fail(self, client, userdata):
+        delay = self._schedule_reconnect()
+        print(f"[MQTT] Could not reach {self.broker}, retrying in {delay:.1f} s")
+        self._set_state("offline")
+        self.connection_status.emit(False)
 
     def on_disconnect(self, client, userdata, rc, properties=None):
         print("[MQTT] Disconnected")
+        if self._started:
+            self._schedule_reconnect()
+            self._set_state("connecting")
         self.connection_status.emit(False)
@@ -0,0 +1,173 @@
+import json
+import struct
+
+
+class PayloadCodec:
+    """
+    Turns a raw MQTT payload (bytes) into a typed value.
+    Codecs are compiled once from the channel's YAML and then called on the
+    network thread for every message, so decode() does no configuration work.
+    decode() raises on malformed payloads; callers count and drop those.
+    """
+    name = "raw"
+
+    def __init__(self):
+        self.errors = 0
+
+    def decode(self, raw: bytes):
+        return raw.decode()
+
+
+class StrCodec(PayloadCodec):
+    name = "str"
+
+
+class FloatCodec(PayloadCodec):
+    name = "float"
+
+    def decode(self, raw: bytes):
+        return float(raw)
+
+
+class IntCodec(PayloadCodec):
+    name = "int"
+
+    def decode(self, raw: bytes):
+        try:
+            return int(raw)
+        except ValueError:
+            return int(float(raw))
+
+
+class BoolCodec(PayloadCodec):
+    """Maps payload strings to True/False, case-insensitively."""
+    name = "bool"
+
+    def __init__(self, true_values=("true", "on", "1"), false_values=("false", "off", "0")):
+        super().__init__()
+        self.mapping = {}
+        for v in true_values:
+            self.mapping[str(v).lower().encode()] = True
+        for v in false_values:
+            self.mapping[str(v).lower().encode()] = False
+
+    def decode(self, raw: bytes):
+        value = self.mapping.get(raw)
+        if value is None:
+            value = self.mapping.get(raw.strip().lower())
+            if value is None:
+                raise ValueError(f"not a boolean: {raw!r}")
+        return value
+
+
+def to_bool(value):
+    """
+    Casts a decoded field to True/False with BoolCodec's default mapping, so
+    "false" and "0" are False; raises on anything else.
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        if value in (0, 1):
+            return bool(value)
+        raise ValueError(f"not a boolean: {value!r}")
+    if isinstance(value, str):
+        value = value.encode()
+    return _BOOL.decode(bytes(value))
+
+
+_BOOL = BoolCodec()
+
+CASTS = {
+    "float": float,
+    "int": int,
+    "str": str,
+    "bool": to_bool,
+    None: lambda v: v,
+}
+
+
+class JsonCodec(PayloadCodec):
+    """
+    Parses JSON and follows `path`, a dotted list of keys and list indices,
+    e.g. "data.values.1".
+    """
+    name = "json"
+
+    def __init__(self, path="", cast=None):
+        super().__init__()
+        self.path = [int(p) if p.lstrip('-').isdigit() else p for p in str(path).split('.') if p != '']
+        self.cast = CASTS[cast]
+
+    def decode(self, raw: bytes):
+        value = json.loads(raw)
+        for key in self.path:
+            value = value[key]
+        return self.cast(value)
+
+
+class CsvCodec(PayloadCodec):
+    """
+    Splits a delimited payload and returns field `index`. Surrounding brackets
+    are ignored, so Python/JSON style sequences like "(1712, 384.23)" work too.
+    """
+    name = "csv"
+
+    def __init__(self, index=0, separator=",", cast="float"):
+        super().__init__()
+        self.index = int(index)
+        self.separator = separator.encode()
+        self.cast = CASTS[cast]
+
+    def decode(self, raw: bytes):
+        field = raw.strip(b" \t\r\n[]()").split(self.separator)[self.index]
+        if self.cast is str:
+            return field.strip().decode()
+        return self.cast(field)
+
+
+class StructCodec(PayloadCodec):
+    """Unpacks a binary payload with a struct format and returns field `index`."""
+    name = "struct"
+
+    def __init__(self, format="<d", index=0):
+        super().__init__()
+        self.struct = struct.Struct(format)
+        self.index = int(index)
+
+    def decode(self, raw: bytes):
+        return self.struct.unpack_from(raw)[self.index]
+
+
+CODECS = {
+    "raw": PayloadCodec,
+    "str": StrCodec,
+    "float": FloatCodec,
+    "int": IntCodec,
+    "integer": IntCodec,
+    "bool": BoolCodec,
+    "boolean": BoolCodec,
+    "json": JsonCodec,
+    "csv": CsvCodec,
+    "struct": StructCodec,
+}
+
+
+def compile_codec(spec=None, channel_type="str") -> PayloadCodec:
+    """
+    Builds the codec for a channel from its YAML `codec` entry.
+
+    spec may be a codec name ("float") or a mapping with a `type` key and that
+    codec's options, e.g. {type: csv, index: 1}. Without a spec the channel
+    `type` decides.
+    """
+    if spec is None:
+        spec = channel_type or "str"
+    if isinstance(spec, str):
+        spec = {"type": spec}
+
+    options = dict(spec)
+    kind = options.pop("type", channel_type)
+    if kind not in CODECS:
+        raise ValueError(f"Unknown codec '{kind}'")
+    return CODECS[kind](**options)
@@ -0,0 +1,119 @@
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from src.gui.devices.frontend.ack_tracker import AckTracker, LatencyHistogram
+
+SETTLE_MODES = ("target", "stable")
+
+
+class PendingSettle:
+    """
+    One command waiting for its readback to settle. wait() blocks until it
+    settled or its timeout ran out, whichever comes first.
+    """
+
+    def __init__(self, tracker, parameter, target, tolerance, samples, timeout, mode):
+        self.tracker = tracker
+        self.parameter = parameter
+        self.target = target
+        self.tolerance = tolerance
+        self.mode = mode if mode in SETTLE_MODES else "target"
+        # A single readback has no spread, so "stable" needs at least two to compare
+        self.samples = max(int(samples), 2 if self.mode == "stable" else 1)
+        self.sent_at = time.time()
+        self.deadline = time.monotonic() + timeout
+        self.matched = 0        # consecutive readbacks meeting the condition
+        self.window = []        # "stable" mode: the last `samples` readbacks
+        self.future = Future()
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    @property
+    def settled(self):
+        return self.future.done() and not self.future.cancelled()
+
+    def wait(self, timeout=None):
+        """Returns (value, settle seconds) once settled, or None if not settled within `timeout` or the deadline."""
+        remaining = max(self.deadline - time.monotonic(), 0.0)
+        try:
+            return self.future.result(remaining if timeout is None else min(timeout, remaining))
+        except TimeoutError:
+            if self.expired:
+                self.tracker.discard(self)
+            return None
+        except Exception:
+            return None
+
+    def update(self, value):
+        """Feeds one readback; returns True when the condition is met."""
+        if self.mode == "stable":
+            self.window.append(value)
+            if len(self.window) > self.samples:
+                del self.window[0]
+            if len(self.window) < self.samples:
+                return False
+            try:
+                spread = max(map(float, self.window)) - min(map(float, self.window))
+            except (TypeError, ValueError):
+                return all(v == self.window[0] for v in self.window)
+            return spread <= (self.tolerance or 0.0)
+        if AckTracker.matches(value, self.target, self.tolerance):
+            self.matched += 1
+        else:
+            self.matched = 0
+        return self.matched >= self.samples
+
+
+class SettleTracker:
+    """
+    Waits for a parameter's status readback to settle after a command, for
+    scans that should move on as soon as the instrument got there instead of
+    after a fixed delay.
+
+    "target" mode needs `samples` consecutive readbacks within `tolerance` of
+    the commanded value; "stable" mode needs the last `samples` (at least 2)
+    readbacks since the command to lie within `tolerance` of each other, for
+    instruments whose readback never quite reaches the setpoint. expect() is
+    called before the command is published; observe() runs on the network
+    thread for every decoded status sample. Settle times are recorded per
+    parameter.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}      # parameter -> PendingSettle
+        self.histograms = {}    # parameter -> LatencyHistogram of settle times
+        self.timeouts = {}      # parameter -> commands that never settled
+
+    def expect(self, parameter, target, tolerance=None, samples=1, timeout=5.0, mode="target") -> PendingSettle:
+        pending = PendingSettle(self, parameter, target, tolerance, samples, timeout, mode)
+        with self._lock:
+            previous = self._pending.get(parameter)
+            self._pending[parameter] = pending
+        if previous is not None:
+            previous.future.cancel()
+        return pending
+
+    def observe(self, parameter, value, timestamp):
+        if parameter not in self._pending:
+            return
+        with self._lock:
+            pending = self._pending.get(parameter)
+            # A readback stamped before the command was sent describes the old position
+            if pending is None or timestamp < pending.sent_at or not pending.update(value):
+                return
+            del self._pending[parameter]
+            elapsed = timestamp - pending.sent_at
+            self.histograms.setdefault(parameter, LatencyHistogram()).add(elapsed)
+        pending.future.set_result((value, elapsed))
+
+    def discard(self, pending):
+        """Forgets a command that did not settle in time, counting it as a timeout."""
+        with self._lock:
+            if self._pending.get(pending.parameter) is not pending:
+                return
+            del self._pending[pending.parameter]
+            self.timeouts[pending.parameter] = self.timeouts.get(pending.parameter, 0) + 1
+        pending.future.cancel()
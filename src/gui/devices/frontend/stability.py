@@ -0,0 +1,158 @@
+import threading
+from src.gui.storage.rolling_stats import RollingStats, ThresholdMean
+
+MAX_WINDOW_SAMPLES = 100_000 # cap of a duration-based window
+
+
+class StabilityDetector:
+    """
+    Judges from its status samples whether a channel has settled, for any
+    channel with a `stability:` section in devices_configuration.yaml.
+
+    The channel is stable when its window (the last `window` samples, or the
+    samples of the last `window_seconds`) is full and
+      - its std is at most `std` (absolute) and/or `rel_std` times |mean|;
+      - its mean is within `setpoint_tolerance` of the last commanded value,
+        once a command has been sent.
+    Criteria that are not configured are not checked. push() runs on the
+    network thread and updates the parameter through set_stable(), which sets
+    its stable flag and event and wakes Parameter.wait_stable() callers; the
+    minimum hold time `hold` becomes the parameter's stability_hold.
+    A new setpoint empties the window, so stability is judged on fresh data.
+    """
+
+    def __init__(self, parameter, window=20, window_seconds=None, std=None, rel_std=None,
+                 setpoint_tolerance=None):
+        self.parameter = parameter
+        self.window = max(int(window), 2)
+        self.window_seconds = window_seconds
+        self.std = std
+        self.rel_std = rel_std
+        self.setpoint_tolerance = setpoint_tolerance
+        self.setpoint = None
+        self.stats = RollingStats(MAX_WINDOW_SAMPLES, window_seconds) if window_seconds \
+            else RollingStats(self.window)
+        self._first = None  # timestamp of the first sample since the last reset
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, parameter, config):
+        """Builds a detector from a channel's `stability:` mapping."""
+        if config is True:
+            config = {}
+        detector = cls(
+            parameter,
+            window=config.get('window', 20),
+            window_seconds=config.get('window_seconds'),
+            std=config.get('std'),
+            rel_std=config.get('rel_std'),
+            setpoint_tolerance=config.get('setpoint_tolerance'),
+        )
+        if 'hold' in config:
+            parameter.stability_hold = float(config['hold'])
+        return detector
+
+    def push(self, timestamp, value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            if self.parameter.received_before_set(timestamp):
+                return # in flight when the last command was sent
+            if self._first is None:
+                self._first = timestamp
+            self.stats.push(value, timestamp)
+            self.parameter.set_stable(self._evaluate(timestamp), timestamp)
+
+    def _evaluate(self, timestamp):
+        stats = self.stats
+        if self.window_seconds:
+            if stats.count < 2 or timestamp - self._first < self.window_seconds:
+                return False
+        elif stats.count < self.window:
+            return False
+        std = stats.std
+        mean = stats.mean
+        if self.std is not None and std > self.std:
+            return False
+        if self.rel_std is not None and std > self.rel_std * abs(mean):
+            return False
+        if self.setpoint_tolerance is not None and self.setpoint is not None:
+            try:
+                if abs(mean - float(self.setpoint)) > self.setpoint_tolerance:
+                    return False
+            except (TypeError, ValueError):
+                pass
+        return True
+
+    def set_setpoint(self, value):
+        """Called when a command is sent: restarts the window and clears the stable flag."""
+        with self._lock:
+            self.setpoint = value
+            self.stats.clear()
+            self._first = None
+            self.parameter.mark_set()
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self._first = None
+            self.parameter.set_stable(False)
+
+
+class WavemeterStability:
+    """
+    The default stability judgement of a wavemeter channel, for wm_freq
+    channels without a `stability:` section.
+
+    The channel is stable when the std of its last `window` samples is below
+    twice the mean std of the device's channels quieter than the `stds`
+    threshold, and, once a frequency was commanded, the window mean is within
+    the parameter's _setpoint_tolerance of it. The channels of one device
+    share `stds` and `lock`. Like StabilityDetector, push() runs on the
+    network thread; a new setpoint restarts the window with `setpoint_window`
+    samples, so the wait reacts faster.
+    """
+
+    def __init__(self, parameter, stds: ThresholdMean, lock, window=50, setpoint_window=10):
+        self.parameter = parameter
+        self.stds = stds
+        self.window = window
+        self.setpoint_window = setpoint_window
+        self.setpoint = None
+        self.stats = RollingStats(window)
+        self._lock = lock
+
+    def push(self, timestamp, value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            if self.parameter.received_before_set(timestamp):
+                return # still from before the last setpoint
+            stats = self.stats
+            stats.push(value)
+            std = stats.std if stats.count > 1 else 1.0 # Default high std if insufficient data
+            self.stds.update(self.parameter.name, std)
+            is_stable = std < self.stds.mean * 2
+            if self.setpoint is not None:
+                try:
+                    offset = abs(stats.mean - float(self.setpoint))
+                    is_stable = is_stable and offset <= self.parameter._setpoint_tolerance
+                except (TypeError, ValueError):
+                    pass
+            self.parameter.set_stable(is_stable, timestamp)
+
+    def set_setpoint(self, value):
+        """Called when a command is sent: restarts the window and clears the stable flag."""
+        with self._lock:
+            self.setpoint = value
+            self.stats = RollingStats(self.setpoint_window)
+            self.parameter.mark_set()
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.parameter.set_stable(False)
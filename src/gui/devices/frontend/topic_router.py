@@ -0,0 +1,161 @@
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+
+def topic_matches(topic_filter, topic):
+    """MQTT filter matching for a single filter/topic pair."""
+    if topic_filter == topic:
+        return True
+    if topic.startswith('$') and topic_filter[:1] in ('+', '#'):
+        return False
+    filter_levels = topic_filter.split('/')
+    topic_levels = topic.split('/')
+    for i, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if i >= len(topic_levels):
+            return False
+        if level != '+' and level != topic_levels[i]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+@dataclass(eq=False)
+class Route:
+    """
+    One subscription target: the topic filter it listens on, the device and
+    parameter it feeds, and the handler called as handler(topic, payload).
+    If history_handler is set it also receives every sample as
+    history_handler(topic, [(timestamp, payload), ...]), not just the latest.
+    With a codec, payloads are decoded on the network thread and handlers get
+    the typed value instead of the payload string.
+    A series (RingBuffer), an archive (HistorianChannel) and a detector
+    (StabilityDetector) get every decoded sample on the network thread.
+    """
+    topic: str
+    handler: Callable[[str, Any], None]
+    device: Any = None
+    parameter: Any = None
+    history_handler: Optional[Callable[[str, list], None]] = None
+    codec: Any = None
+    series: Any = None
+    archive: Any = None
+    detector: Any = None
+
+
+class _Node:
+    __slots__ = ("children", "routes", "hash_routes")
+
+    def __init__(self):
+        self.children = {}    # level -> _Node ('+' is stored like any other level)
+        self.routes = []      # routes whose filter ends exactly here
+        self.hash_routes = [] # routes whose filter ends here with '/#'
+
+
+class TopicRouter:
+    """
+    Maps MQTT topics to routes in O(topic length).
+
+    Plain topics (no wildcards) live in a dict and are found with a single
+    lookup. Filters containing '+' or '#' go into a trie walked level by level,
+    with the usual MQTT rules: '+' matches exactly one level, '#' matches the
+    parent level and everything below it, and wildcards in the first level do
+    not match topics starting with '$'.
+
+    Routes are added/removed from the GUI thread and matched from the network
+    thread; mutations take a lock, lookups don't.
+    """
+
+    def __init__(self):
+        self._exact = {}     # plain topic -> [Route]
+        self._root = _Node() # wildcard filters
+        self._wildcards = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_wildcard(topic_filter):
+        return '+' in topic_filter or '#' in topic_filter
+
+    def add(self, topic_filter, handler, device=None, parameter=None, history_handler=None,
+            codec=None, series=None, archive=None, detector=None) -> Route:
+        route = Route(topic_filter, handler, device, parameter, history_handler, codec, series, archive, detector)
+        with self._lock:
+            if not self.is_wildcard(topic_filter):
+                self._exact[topic_filter] = self._exact.get(topic_filter, []) + [route]
+                return route
+
+            node = self._root
+            levels = topic_filter.split('/')
+            for i, level in enumerate(levels):
+                if level == '#':
+                    if i != len(levels) - 1:
+                        raise ValueError(f"'#' must be the last level: {topic_filter}")
+                    node.hash_routes = node.hash_routes + [route]
+                    break
+                node = node.children.setdefault(level, _Node())
+            else:
+                node.routes = node.routes + [route]
+            self._wildcards += 1
+        return route
+
+    def remove(self, route: Route):
+        with self._lock:
+            if not self.is_wildcard(route.topic):
+                routes = [r for r in self._exact.get(route.topic, []) if r is not route]
+                if routes:
+                    self._exact[route.topic] = routes
+                else:
+                    self._exact.pop(route.topic, None)
+                return
+
+            node = self._root
+            for level in route.topic.split('/'):
+                if level == '#':
+                    node.hash_routes = [r for r in node.hash_routes if r is not route]
+                    break
+                node = node.children.get(level)
+                if node is None:
+                    return
+            else:
+                node.routes = [r for r in node.routes if r is not route]
+            self._wildcards -= 1
+
+    def match(self, topic) -> list:
+        """Returns every route whose filter matches this concrete topic."""
+        found = self._exact.get(topic)
+        if not self._wildcards:
+            return found or []
+
+        found = list(found) if found else []
+        levels = topic.split('/')
+        skip_wildcards = topic.startswith('$')
+        nodes = [self._root]
+        for i, level in enumerate(levels):
+            next_nodes = []
+            for node in nodes:
+                if not (skip_wildcards and i == 0):
+                    found.extend(node.hash_routes)
+                    plus = node.children.get('+')
+                    if plus is not None:
+                        next_nodes.append(plus)
+                child = node.children.get(level)
+                if child is not None:
+                    next_nodes.append(child)
+            nodes = next_nodes
+            if not nodes:
+                return found
+        for node in nodes:
+            found.extend(node.hash_routes)
+            found.extend(node.routes)
+        return found
+
+    def dispatch(self, topic, payload) -> int:
+        """Calls the handler of every matching route. Returns how many there were."""
+        routes = self.match(topic)
+        for route in routes:
+            try:
+                route.handler(topic, payload)
+            except Exception as e:
+                print(f"[Router] Handler for {route.topic} failed: {e}")
+        return len(routes)
@@ -0,0 +1,220 @@
+"""
+Recording and replay of the MQTT traffic a MqttHandler receives.
+
+File format (little endian), append-only:
+
+    header   b"MIMICREC" + version (uint8)
+    topic    b"T" + topic id (uint32) + length (uint16) + utf-8 topic
+    message  b"M" + receive time (float64) + topic id (uint32) + length (uint32) + payload
+
+Each topic string is stored once, the first time it is seen, and messages
+refer to it by id. A file cut short by a crash stays readable up to its last
+complete record, and reopening a file for recording appends to it.
+"""
+import os
+import struct
+import threading
+import time
+
+MAGIC = b"MIMICREC"
+VERSION = 1
+TOPIC = struct.Struct("<cIH")
+MESSAGE = struct.Struct("<cdII")
+FLUSH_INTERVAL = 1.0 # seconds between writes of the record buffer
+
+
+class TrafficRecorder:
+    """
+    Appends (receive time, topic, payload) records to a file. record() runs on
+    the network thread and only appends to an in-memory buffer; a writer
+    thread writes the buffer out every FLUSH_INTERVAL seconds, and flush() and
+    close() write it out at once. Write errors are counted in `errors`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.topics = {}        # topic -> id
+        self.messages = 0
+        self.errors = 0         # failed writes; their records are lost
+        self._buffer = bytearray()
+        self._lock = threading.Lock()       # guards the buffer and topic table
+        self._io_lock = threading.Lock()    # serialises writes to the file
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            end = len(MAGIC) + 1
+            for offset, record in _scan(path):
+                if record[0] == b"T":
+                    self.topics[record[2]] = record[1]
+                end = offset
+            self._file = open(path, "r+b")
+            self._file.truncate(end) # drop a partial record left by a crash
+            self._file.seek(end)
+        else:
+            self._file = open(path, "wb")
+            self._file.write(MAGIC + bytes([VERSION]))
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="TrafficRecorder", daemon=True)
+        self._thread.start()
+
+    def record(self, topic, payload, timestamp):
+        with self._lock:
+            topic_id = self.topics.get(topic)
+            if topic_id is None:
+                topic_id = len(self.topics)
+                self.topics[topic] = topic_id
+                name = topic.encode()
+                self._buffer += TOPIC.pack(b"T", topic_id, len(name))
+                self._buffer += name
+            self._buffer += MESSAGE.pack(b"M", timestamp, topic_id, len(payload))
+            self._buffer += payload
+            self.messages += 1
+
+    def _run(self):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            self._write()
+
+    def _write(self, sync=False):
+        with self._io_lock:
+            with self._lock:
+                data, self._buffer = self._buffer, bytearray()
+            if self._file is None:
+                return
+            try:
+                if data:
+                    self._file.write(data)
+                if sync:
+                    self._file.flush()
+            except OSError as e:
+                self.errors += 1
+                if self.errors == 1:
+                    print(f"[MQTT] Writing traffic recording {self.path} failed: {e}")
+
+    def flush(self):
+        self._write(sync=True)
+
+    def close(self):
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._write()
+        with self._io_lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+
+
+def _scan(path):
+    """
+    Yields (end offset, record) for every complete record. record is
+    (b"T", id, topic) or (b"M", timestamp, topic id, payload).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a MIMIC traffic recording")
+    if data[len(MAGIC)] != VERSION:
+        raise ValueError(f"Unsupported recording version {data[len(MAGIC)]}")
+    pos = len(MAGIC) + 1
+    size = len(data)
+    while pos < size:
+        kind = data[pos:pos + 1]
+        if kind == b"M":
+            if pos + MESSAGE.size > size:
+                return
+            _, timestamp, topic_id, length = MESSAGE.unpack_from(data, pos)
+            start = pos + MESSAGE.size
+            if start + length > size:
+                return
+            pos = start + length
+            yield pos, (b"M", timestamp, topic_id, data[start:pos])
+        elif kind == b"T":
+            if pos + TOPIC.size > size:
+                return
+            _, topic_id, length = TOPIC.unpack_from(data, pos)
+            start = pos + TOPIC.size
+            if start + length > size:
+                return
+            pos = start + length
+            yield pos, (b"T", topic_id, data[start:pos].decode())
+        else:
+            raise ValueError(f"Corrupt recording {path} at byte {pos}")
+
+
+def read_recording(path):
+    """Returns the recorded messages as a list of (timestamp, topic, payload bytes)."""
+    topics = {}
+    messages = []
+    for _, record in _scan(path):
+        if record[0] == b"M":
+            messages.append((record[1], topics[record[2]], record[3]))
+        elif record[0] == b"T":
+            topics[record[1]] = record[2]
+    return messages
+
+
+class TrafficReplayer:
+    """
+    Feeds a recording back into a MqttHandler, through the same ingest path
+    as live messages (routing, decoding, ack matching, buffering, GUI drain).
+
+    speed=1 reproduces the recorded timing, speed=N plays N times faster and
+    speed=0 replays as fast as possible. Messages get the replay time as their
+    receive time. replay() blocks; start() runs it in a background thread.
+    """
+
+    def __init__(self, handler, path, speed=1.0):
+        self.handler = handler
+        self.messages = read_recording(path)
+        self.speed = float(speed)
+        self.replayed = 0
+        self.max_lateness = 0.0 # seconds behind the recorded schedule
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def duration(self):
+        """Length of the recording in seconds."""
+        if not self.messages:
+            return 0.0
+        return self.messages[-1][0] - self.messages[0][0]
+
+    def replay(self):
+        self._stop.clear()
+        self.replayed = 0
+        self.max_lateness = 0.0
+        if not self.messages:
+            return
+        first = self.messages[0][0]
+        start = time.perf_counter()
+        ingest = self.handler.ingest
+        for timestamp, topic, payload in self.messages:
+            if self._stop.is_set():
+                break
+            if self.speed > 0:
+                delay = (timestamp - first) / self.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    if self._stop.wait(delay):
+                        break
+                else:
+                    self.max_lateness = max(self.max_lateness, -delay)
+            ingest(topic, payload, time.time())
+            self.replayed += 1
+        self.elapsed = time.perf_counter() - start
+
+    def start(self):
+        self._thread = threading.Thread(target=self.replay, name="MqttReplay", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self._thread is None or not self._thread.is_alive()
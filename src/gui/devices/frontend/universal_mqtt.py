@@ -5,58 +5,93 @@ from src.gui.devices.frontend.generic_mqtt_device import GenericMqttDevice
 class UniversalMqttDevice(GenericMqttDevice):
     """
     A generic MQTT device driver that can handle multiple channels/parameters dynamically.
-    It emits a signal (topic, payload) for ANY message received on its subscribed topics.
+    Messages are delivered per topic by the shared router, either to the handler
+    given in subscribe_param or as a (suffix, payload) signal.
+    Reconnects and resubscriptions are handled by the shared MqttHandler.
+
+    subscription_mode decides what the broker is asked for:
+      - "topics":   one SUBSCRIBE per status topic, sent as soon as it is added.
+      - "batch":    topics are collected and sent as one multi-topic SUBSCRIBE
+                    by commit_subscriptions().
+      - "wildcard": a single SUBSCRIBE to base_topic/#; the router still only
+                    delivers the topics that were added.
     """
     message_received_signal = pyqtSignal(str, str)
 
-    def __init__(self, base_topic, broker_address="127.0.0.1"):
-        super().__init__(base_topic, broker_address)
-        self.subscriptions = set()
+    SUBSCRIPTION_MODES = ("topics", "batch", "wildcard")
 
-        self.mqtt.connection_status.connect(self._on_connection_change)
+    def __init__(self, base_topic, broker_address="127.0.0.1", subscription_mode="topics"):
+        super().__init__(base_topic, broker_address)
+        if subscription_mode not in self.SUBSCRIPTION_MODES:
+            print(f"[{base_topic}] Unknown subscription_mode '{subscription_mode}', using 'topics'")
+            subscription_mode = "topics"
+        self.subscription_mode = subscription_mode
+        self.subscriptions = {} # full topic -> Route
+        self._pending = []      # topics not yet sent to the broker (batch mode)
+        self._wildcard_topic = None
 
-    def subscribe_param(self, suffix):
+    def subscribe_param(self, suffix, handler=None, parameter=None, device=None, history_handler=None,
+                        codec=None, series=None, archive=None, detector=None):
         """
         Subscribes to base_topic + "/" + suffix.
+        Messages on that topic go straight to handler(topic, payload) through the
+        shared router; without a handler they are re-emitted on message_received_signal.
+        history_handler, if given, gets every sample received between two GUI refreshes.
+        codec, if given, decodes payloads on the network thread (see payload_codecs).
+        series, if given, is a RingBuffer that records every decoded sample.
+        archive, if given, gets every decoded sample too (see historian).
+        detector, if given, judges the parameter's stability from every decoded sample (see stability).
         """
         clean_base = self.topic_base.rstrip('/')
         clean_suffix = suffix.lstrip('/')
         full_topic = f"{clean_base}/{clean_suffix}"
 
-        if full_topic not in self.subscriptions:
-            self.subscriptions.add(full_topic)
+        if full_topic in self.subscriptions:
+            return
+
+        if handler is None:
+            handler = lambda topic, payload: self.message_received_signal.emit(clean_suffix, str(payload))
+        self.subscriptions[full_topic] = self.mqtt.router.add(
+            full_topic, handler, device=device or self, parameter=parameter,
+            history_handler=history_handler, codec=codec, series=series, archive=archive,
+            detector=detector
+        )
+
+        if self.subscription_mode == "topics":
             self.mqtt.subscribe(full_topic)
+        elif self.subscription_mode == "batch":
+            self._pending.append(full_topic)
+        elif self._wildcard_topic is None:
+            self._wildcard_topic = f"{clean_base}/#"
+            self.mqtt.subscribe(self._wildcard_topic)
 
-        try:
-            self.mqtt.message_received.disconnect(self._on_global_message)
-        except:
-            pass
-        self.mqtt.message_received.connect(self._on_global_message)
+    def commit_subscriptions(self):
+        """Sends the topics collected in batch mode as a single SUBSCRIBE."""
+        if self._pending:
+            self.mqtt.subscribe_many(self._pending)
+            self._pending = []
 
-    def _on_connection_change(self, connected):
-        """
-        Triggered when MqttHandler connects or disconnects.
-        If we just connected, we must RE-SUBSCRIBE to everything.
-        """
-        if connected:
-            print(f"[{self.topic_base}] Reconnected! Restoring {len(self.subscriptions)} subscriptions...")
-            for topic in self.subscriptions:
-                self.mqtt.subscribe(topic)
-                print(f"   -> Resubscribed to {topic}")
+    def close(self):
+        """Drops this device's subscriptions and its reference on the shared connection."""
+        self._pending = []
+        for topic, route in self.subscriptions.items():
+            self.mqtt.router.remove(route)
+            if self.subscription_mode != "wildcard":
+                self.mqtt.unsubscribe(topic)
+        self.subscriptions.clear()
+        if self._wildcard_topic is not None:
+            self.mqtt.unsubscribe(self._wildcard_topic)
+            self._wildcard_topic = None
+        super().close()
+
+    def configure_command(self, suffix, qos=0, max_rate=0.0, coalesce=True):
+        """Sets QoS, max commands per second and coalescing for base_topic/suffix."""
+        self.mqtt.commands.configure(f"{self.topic_base}/{suffix}", qos, max_rate, coalesce)
 
     def publish_param(self, suffix, value):
         """
-        Publishes value to base_topic + "/" + suffix.
+        Queues value for base_topic + "/" + suffix. The shared command queue
+        publishes it from its own thread, so this never blocks the caller.
         """
         full_topic = f"{self.topic_base}/{suffix}"
-        self.mqtt.publish(full_topic, str(value))
-
-    def _on_global_message(self, topic, payload):
-        """
-        Filters messages. If topic starts with base_topic, emit signal with suffix.
-        """
-        # print(f"DEBUG MQTT RAW: {topic} -> {payload}")
-        if topic.startswith(self.topic_base):
-            if len(topic) > len(self.topic_base):
-                suffix = topic[len(self.topic_base):].lstrip('/')
-                self.message_received_signal.emit(suffix, payload)
+        self.mqtt.commands.put(full_topic, str(value))
@@ -1,12 +1,26 @@
 import os
+import threading
 import yaml
-import math
-from collections import deque
 from functools import partial
-from src.gui.devices.frontend.instrument_base import InstrumentBase, Parameter
+from src.gui.devices.frontend.instrument_base import InstrumentBase, Parameter, STABILITY_HOLD
 from src.gui.devices.frontend.universal_mqtt import UniversalMqttDevice
+from src.gui.devices.frontend.payload_codecs import PayloadCodec, compile_codec
+from src.gui.devices.frontend.stability import StabilityDetector, WavemeterStability
+from src.gui.storage.timeseries_store import store, DEFAULT_CAPACITY
+from src.gui.storage.historian import Historian
+from src.gui.storage.rolling_stats import ThresholdMean
 
 BROKER = None
+REFRESH_HZ = None
+GRAPH_FPS = None
+HISTORIAN = None # Historian writing every numeric channel to disk, if configured
+HISTORY_SIZE = DEFAULT_CAPACITY
+SCAN_LOG = {} # flush policy of the scan CSV writer
+NUMERIC_TYPES = ('float', 'integer', 'boolean')
+WM_WINDOW = 50 # wavemeter samples in the stability window
+WM_SETPOINT_WINDOW = 10 # shorter window after a new setpoint, so the wait reacts faster
+WM_STD_THRESHOLD = 0.000_002 # THz, channels noisier than this don't count towards the reference std
+WM_SETPOINT_TOLERANCE = 0.000_010 # THz, largest distance of the window mean from the setpoint
 CONFIG_PATH = 'config/devices_configuration.yaml'
 
 def load_yaml_config():
@@ -30,10 +44,12 @@ class GenericYamlDevice(InstrumentBase):
         self.id = device_config.get('id', None)
         self.setpoint = None
 
-        # Storage for Wavemeter stability analysis
-        self.wm_history = {}      # param.name -> deque of recent values
-        self.wm_stds = {}         # param.name -> last calculated std
-        self.wm_last_values = {}  # param.name -> last received value
+        # Shared by the WavemeterStability of every wm_freq channel
+        self.wm_stds = ThresholdMean(WM_STD_THRESHOLD) # param.name -> last calculated std
+        self._wm_lock = threading.Lock()
+
+        self.status_params = {}   # status_suffix -> Parameter
+        self.command_params = {}  # command_suffix -> Parameter
 
         for channel in device_config.get('channels', []):
             self._add_yaml_channel(channel)
@@ -68,20 +84,63 @@ class GenericYamlDevice(InstrumentBase):
             param_type=ui_type,
             unit=unit,
             set_cmd=setter,
-            get_cmd=None
+            get_cmd=None,
+            move_cost=float(chan_config.get('move_cost', 1.0)),
+            stability_hold=float(chan_config.get('stability_hold', STABILITY_HOLD))
         )
 
         status_suffix = chan_config.get('status_suffix')
         command_suffix = chan_config.get('command_suffix')
         if status_suffix:
             param._status_suffix = status_suffix
+            param._codec = self._compile_channel_codec(chan_config, ui_type)
+            param._ack_tolerance = chan_config.get('ack_tolerance')
+            if ui_type == 'wm_freq':
+                param._setpoint_tolerance = float(chan_config.get('setpoint_tolerance', WM_SETPOINT_TOLERANCE))
+            if p_type in NUMERIC_TYPES or ui_type == 'wm_freq':
+                param.series = store.channel(self.id or self.name, key,
+                                             chan_config.get('history_size', HISTORY_SIZE))
+                if HISTORIAN is not None and chan_config.get('archive', True):
+                    param._archive = HISTORIAN.channel(self.id or self.name, key)
+                if chan_config.get('stability'):
+                    param.detector = StabilityDetector.from_config(param, chan_config['stability'])
+                elif ui_type == 'wm_freq':
+                    param.detector = WavemeterStability(param, self.wm_stds, self._wm_lock,
+                                                        WM_WINDOW, WM_SETPOINT_WINDOW)
+            self.status_params[status_suffix] = param
+            if setter:
+                param.confirm_cmd = partial(self.set_and_confirm, cmd_suffix)
+                param.settle_cmd = partial(self.set_and_settle, cmd_suffix)
+                param._settle = {
+                    'tolerance': chan_config.get('settle_tolerance', chan_config.get('ack_tolerance')),
+                    'samples': chan_config.get('settle_samples', 1),
+                    'timeout': chan_config.get('settle_timeout', 5.0),
+                    'mode': chan_config.get('settle_mode', 'target'),
+                }
         if command_suffix:
             param._command_suffix = command_suffix
+            param._command_options = {
+                'qos': chan_config.get('command_qos', 0),
+                'max_rate': chan_config.get('command_max_rate', 0),
+                'coalesce': chan_config.get('command_coalesce', True),
+            }
+            self.command_params[command_suffix] = param
         if access:
             param._access = access
 
         self.add_parameter(param)
 
+    def _compile_channel_codec(self, chan_config, ui_type):
+        """Wavemeters publish "(timestamp, frequency)" unless the channel says otherwise."""
+        spec = chan_config.get('codec')
+        if spec is None and ui_type == 'wm_freq':
+            spec = {'type': 'csv', 'index': 1}
+        try:
+            return compile_codec(spec, chan_config.get('type', 'str'))
+        except Exception as e:
+            print(f"[{self.name}] Invalid codec for {chan_config.get('key')}: {e}")
+            return PayloadCodec()
+
     def connect_instrument(self):
         if not self.mqtt_base:
             return
@@ -89,86 +148,110 @@ class GenericYamlDevice(InstrumentBase):
         print(f"[{self.name}] Connecting to MQTT: {self.mqtt_base}")
 
         try:
-            self.driver = UniversalMqttDevice(self.mqtt_base, broker_address=BROKER)
-            for param in self.get_all_params():
-                if hasattr(param, '_status_suffix') and param._status_suffix:
-                    #print(param._status_suffix)
-                    self.driver.subscribe_param(param._status_suffix)
-
-            self.driver.message_received_signal.connect(self.on_mqtt_message)
-            self.driver.mqtt.start()
+            self.driver = UniversalMqttDevice(
+                self.mqtt_base,
+                broker_address=BROKER,
+                subscription_mode=self.config.get('subscription_mode', 'topics')
+            )
+            if REFRESH_HZ:
+                self.driver.mqtt.set_max_refresh_rate(REFRESH_HZ)
+            self.set_connection_state(self.driver.mqtt.state)
+            self.driver.mqtt.state_changed.connect(self.set_connection_state)
+            for suffix, param in self.status_params.items():
+                self.driver.subscribe_param(
+                    suffix,
+                    handler=partial(self.on_param_message, param),
+                    parameter=param,
+                    device=self,
+                    history_handler=partial(self.on_param_samples, param),
+                    codec=param._codec,
+                    series=param.series,
+                    archive=getattr(param, '_archive', None),
+                    detector=param.detector
+                )
+            self.driver.commit_subscriptions()
+            for suffix, param in self.command_params.items():
+                self.driver.configure_command(suffix, **param._command_options)
 
         except Exception as e:
             print(f"[{self.name}] Connection failed: {e}")
 
     def set_value_wrapper(self, suffix, value):
+        """
+        Sends a command. For channels that also report a status, returns the
+        Future that the ack tracker resolves once the status reflects the value.
+        """
+        future = None
         if self.driver:
-            for param in self.get_all_params():
-                if hasattr(param, '_command_suffix') and param._command_suffix == suffix:
-                    if  'SET/frequency' in suffix:
-                        self.setpoint = value
-                        # print("FHJIOUHWEFOIIHWEOFIHOWEIFHOIWEFHOIWEFH")
-                        if hasattr(param, 'notify_readout_rich_freq'):
-                            # print('MMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMM')
-                            param.notify_readout_rich_freq(param.update_current_value(), stable=False)
-                            self.wm_history[param.name] = deque(maxlen=10) #hardreset
+            param = self.command_params.get(suffix)
+            if param is not None and hasattr(param, '_status_suffix'):
+                future = self.driver.mqtt.acks.expect(param, value, param._ack_tolerance)
+            if param is not None and 'SET/frequency' in suffix:
+                param.mark_set()
+                self.setpoint = value
+                if hasattr(param, 'notify_readout_rich_freq'):
+                    param.notify_readout_rich_freq(param.update_current_value(), stable=False)
+            if param is not None and param.detector is not None:
+                param.detector.set_setpoint(value)
 
             self.driver.publish_param(suffix, value)
-
-    def on_mqtt_message(self, suffix, payload):
-        # print(payload)
-        for param in self.get_all_params():
-            if hasattr(param, '_status_suffix') and param._status_suffix == suffix:
-
-                if param.param_type == 'wm_freq':
-                    try:
-                        val = float(eval(payload)[1])
-                    except ValueError:
-                        val = 0.0
-
-                    if param.name not in self.wm_history:
-                        self.wm_history[param.name] = deque(maxlen=50)
-
-                    self.wm_history[param.name].append(val)
-                    self.wm_last_values[param.name] = val
-
-                    hist = list(self.wm_history[param.name])
-                    if len(hist) > 1:
-                        avg = sum(hist) / len(hist)
-                        variance = sum((x - avg) ** 2 for x in hist) / len(hist)
-                        std = math.sqrt(variance)
-                    else:
-                        std = 1.0 # Default high std if insufficient data
-
-                    self.wm_stds[param.name] = std
-
-                    # Determine Stability Criteria
-                    # Filter std values < 10 MHz (0.00001 THz)
-                    threshold_thz = 0.000_002
-                    filtered_stds = [s for s in self.wm_stds.values() if s < threshold_thz]
-
-                    if filtered_stds:
-                        averaged_std = sum(filtered_stds) / len(filtered_stds)
-                    else:
-                        averaged_std = 0.0
-
-                    p_std = self.wm_stds.get(param.name, 1.0)
-                    if self.setpoint is not None: is_stable = p_std < averaged_std*2 and  val*1e6 in range(int((val-averaged_std*2)*1e6), int((val+averaged_std*2)*1e6))
-                    else:is_stable = p_std < averaged_std*2
-
-                    param.stable = is_stable
-
-                    if hasattr(param, 'notify_readout_rich_freq'):
-                        param.notify_readout_rich_freq(val, stable=is_stable)
-
-                elif param.param_type == 'bool':
-                    if hasattr(param, 'notify_widget'):
-                        param.notify_widget(payload)
-
-                # If param is read_write, update READOUT label
-                else:
-                    if hasattr(param, 'notify_readout'):
-                        param.notify_readout_rich_parameter(payload)
+        return future
+
+    def set_and_confirm(self, suffix, value, timeout=5.0):
+        """
+        Sends a command and blocks until the status topic reports the new value.
+        Returns (value, round-trip seconds), or None on timeout or if the
+        channel has no status to confirm with. Don't call it from the GUI thread.
+        """
+        future = self.set_value_wrapper(suffix, value)
+        if future is None:
+            return None
+        return self.driver.mqtt.acks.wait(self.command_params[suffix], future, timeout)
+
+    def set_and_settle(self, suffix, value):
+        """
+        Sends a command and returns a PendingSettle whose wait() blocks until the
+        status readback settled as configured by the channel's settle_* fields,
+        or None if the device is not connected.
+        """
+        if not self.driver:
+            return None
+        param = self.command_params[suffix]
+        pending = self.driver.mqtt.settles.expect(param, value, **param._settle)
+        self.set_value_wrapper(suffix, value)
+        return pending
+
+    def ack_latencies(self):
+        """Round-trip latency summary per parameter name."""
+        if not self.driver:
+            return {}
+        histograms = self.driver.mqtt.acks.histograms
+        return {p.name: histograms[p].summary() for p in self.get_all_params() if p in histograms}
+
+    def on_param_samples(self, param, topic, samples):
+        """
+        Router history handler: every (timestamp, value) received since the
+        last GUI refresh, oldest first, already decoded by the channel codec.
+        The newest one is then also passed to on_param_message, which updates
+        the widgets.
+        """
+        for timestamp, value in samples[:-1]:
+            param.update_current_value(value)
+
+    def on_param_message(self, param, topic, value):
+        """Router handler: the latest decoded value on this parameter's status topic."""
+        if param.param_type == 'wm_freq':
+            if hasattr(param, 'notify_readout_rich_freq'):
+                param.notify_readout_rich_freq(value, stable=param.stable)
+
+        elif param.param_type == 'bool':
+            if hasattr(param, 'notify_widget'):
+                param.notify_widget(value)
+
+        # If param is read_write, update READOUT label
+        else:
+            if hasattr(param, 'notify_readout'):
+                param.notify_readout_rich_parameter(value)
 
 
 
@@ -178,6 +261,25 @@ class GenericYamlDevice(InstrumentBase):
 config_data = load_yaml_config()
 if config_data:
     BROKER = config_data.get('broker', '')
+    REFRESH_HZ = config_data.get('gui_refresh_hz')
+    GRAPH_FPS = config_data.get('graph_fps')
+    historian_config = config_data.get('historian')
+    if historian_config:
+        if isinstance(historian_config, str):
+            historian_config = {'path': historian_config}
+        try:
+            HISTORIAN = Historian(
+                historian_config.get('path', 'data/history'),
+                segment_seconds=historian_config.get('segment_hours', 1) * 3600,
+                retention_days=historian_config.get('retention_days'),
+                compress=historian_config.get('compress', True)
+            )
+            HISTORIAN.start()
+        except Exception as e:
+            print(f"[Historian] Disabled: {e}")
+            HISTORIAN = None
+    HISTORY_SIZE = config_data.get('history_size', DEFAULT_CAPACITY)
+    SCAN_LOG = config_data.get('scan_log') or {}
     for i, dev_conf in enumerate(config_data.get('devices', [])):
         dev_id = dev_conf.get('id')
 
@@ -69,7 +69,7 @@ class MainWindow(QMainWindow):
         self.stack.addWidget(self.live_update_page)
 
         # Scan
-        self.scan_page = ScanTab(self.devices_panel.loaded_instruments)
+        self.scan_page = ScanTab(self.devices_panel.loaded_instruments, self.devices_panel.scan_log)
         self.stack.addWidget(self.scan_page)
 
         # About
@@ -0,0 +1,185 @@
+"""
+Downsampling of long time series for display.
+
+A line plot cannot show more than a couple of points per horizontal pixel, so
+plotting a window of a million samples only costs time. Decimator reduces a
+RingBuffer window to about the widget's pixel width:
+
+  - "minmax" keeps the lowest and highest sample of every bucket, in time
+    order, so spikes and the signal envelope survive exactly;
+  - "lttb" runs Largest-Triangle-Three-Buckets on a min/max preselection,
+    which keeps the visual shape with a single point per pixel.
+
+Buckets hold a power-of-two number of samples and are counted from the first
+sample ever written, so a bucket's min/max never changes once it is complete.
+Each resolution level is cached and only the buckets completed since the last
+query are computed.
+"""
+import numpy as np
+
+MODES = ("minmax", "lttb", "none")
+
+
+def minmax_reduce(t, v, size):
+    """
+    Splits (t, v) into consecutive buckets of `size` samples (len(t) must be a
+    multiple of it) and returns, per bucket, its min and max sample in time order
+    as (t_first, v_first, t_second, v_second).
+    """
+    tb = t.reshape(-1, size)
+    vb = v.reshape(-1, size)
+    rows = np.arange(len(vb))
+    i_min = np.argmin(vb, axis=1)
+    i_max = np.argmax(vb, axis=1)
+    first = np.minimum(i_min, i_max)
+    second = np.maximum(i_min, i_max)
+    return tb[rows, first], vb[rows, first], tb[rows, second], vb[rows, second]
+
+
+def interleave(t_first, v_first, t_second, v_second):
+    t = np.empty(2 * len(t_first))
+    v = np.empty(2 * len(v_first))
+    t[0::2], t[1::2] = t_first, t_second
+    v[0::2], v[1::2] = v_first, v_second
+    return t, v
+
+
+def minmax_decimate(t, v, n_buckets):
+    """Uncached min/max envelope of (t, v) with about n_buckets buckets (2 points each)."""
+    n = len(t)
+    if n <= 2 * n_buckets:
+        return t, v
+    size = -(-n // n_buckets)
+    full = n - n % size
+    parts = [interleave(*minmax_reduce(t[:full], v[:full], size))]
+    if full < n:
+        parts.append(interleave(*minmax_reduce(t[full:], v[full:], n - full)))
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+def lttb(t, v, n_out):
+    """
+    Largest-Triangle-Three-Buckets: keeps the first and last point and, from
+    every bucket in between, the point forming the largest triangle with the
+    point kept before it and the mean of the next bucket.
+    """
+    n = len(t)
+    if n_out >= n or n_out < 3:
+        return t, v
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out_t = np.empty(n_out)
+    out_v = np.empty(n_out)
+    out_t[0], out_v[0] = t[0], v[0]
+    out_t[-1], out_v[-1] = t[-1], v[-1]
+
+    # Means of every bucket, used as the third vertex of the previous one
+    sizes = np.diff(edges)
+    mean_t = np.add.reduceat(t[1:n - 1], edges[:-1] - 1) / sizes
+    mean_v = np.add.reduceat(v[1:n - 1], edges[:-1] - 1) / sizes
+
+    a_t, a_v = t[0], v[0]
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 1 < n_out - 2:
+            c_t, c_v = mean_t[b + 1], mean_v[b + 1]
+        else:
+            c_t, c_v = t[-1], v[-1]
+        bt = t[lo:hi]
+        bv = v[lo:hi]
+        area = np.abs((a_t - c_t) * (bv - a_v) - (a_t - bt) * (c_v - a_v))
+        k = int(np.argmax(area))
+        a_t, a_v = bt[k], bv[k]
+        out_t[b + 1], out_v[b + 1] = a_t, a_v
+    return out_t, out_v
+
+
+class _Level:
+    """Cached min/max buckets of 2**k samples, kept in a ring like the series itself."""
+
+    def __init__(self, size, capacity):
+        self.size = size
+        self.slots = capacity // size + 2
+        self.done = 0   # buckets [.., done) are computed
+        self.t_first = np.empty(self.slots)
+        self.v_first = np.empty(self.slots)
+        self.t_second = np.empty(self.slots)
+        self.v_second = np.empty(self.slots)
+
+    def update(self, count, t, v):
+        """Computes the buckets completed since the last update. t/v are a snapshot with `count` samples written."""
+        oldest = count - len(t)
+        upto = count // self.size
+        start = max(self.done, -(-oldest // self.size))
+        if start < upto:
+            lo = start * self.size - oldest
+            hi = upto * self.size - oldest
+            reduced = minmax_reduce(t[lo:hi], v[lo:hi], self.size)
+            idx = np.arange(start, upto) % self.slots
+            for dest, src in zip((self.t_first, self.v_first, self.t_second, self.v_second), reduced):
+                dest[idx] = src
+        self.done = upto
+
+    def get(self, first, last):
+        idx = np.arange(first, last) % self.slots
+        return self.t_first[idx], self.v_first[idx], self.t_second[idx], self.v_second[idx]
+
+
+class Decimator:
+    """
+    Incremental, cached display decimation of one RingBuffer.
+    query(since, width) returns (t, v) ready for setData, with about `width`
+    buckets. Windows that already fit are returned as zero-copy views.
+    """
+
+    def __init__(self, series, mode="minmax"):
+        self.series = series
+        self.mode = mode if mode in MODES else "minmax"
+        self._levels = {}   # bucket size -> _Level
+        self._count = 0
+
+    def set_mode(self, mode):
+        self.mode = mode if mode in MODES else "minmax"
+
+    def _level(self, size):
+        level = self._levels.get(size)
+        if level is None:
+            level = _Level(size, self.series.capacity)
+            self._levels[size] = level
+        return level
+
+    def query(self, since=None, width=1000):
+        count, t, v = self.series.snapshot()
+        if count < self._count:
+            self._levels.clear() # the series was cleared
+        self._count = count
+
+        first = 0 if since is None else int(np.searchsorted(t, since, side='left'))
+        n = len(t) - first
+        width = max(int(width), 1)
+        # lttb picks one point out of every few min/max points
+        buckets = width if self.mode == "minmax" else 2 * width
+        if self.mode == "none" or n <= 2 * buckets:
+            return t[first:], v[first:]
+
+        size = 1 << int(np.ceil(np.log2(n / buckets)))
+        level = self._level(size)
+        level.update(count, t, v)
+
+        oldest = count - len(t)
+        start = oldest + first              # absolute index of the first sample shown
+        b_first = -(-start // size)
+        b_last = count // size
+        parts = []
+        head = b_first * size - oldest
+        if first < head:
+            parts.append(minmax_reduce(t[first:head], v[first:head], head - first))
+        if b_first < b_last:
+            parts.append(level.get(b_first, b_last))
+        tail = b_last * size - oldest
+        if tail < len(t) and tail >= head:
+            parts.append(minmax_reduce(t[tail:], v[tail:], len(t) - tail))
+        out_t, out_v = interleave(*(np.concatenate(column) for column in zip(*parts)))
+
+        if self.mode == "lttb":
+            return lttb(out_t, out_v, width)
+        return out_t, out_v
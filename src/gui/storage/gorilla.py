@@ -0,0 +1,212 @@
+"""
+Compressed encoding of (timestamp, float) series, after Facebook's Gorilla:
+timestamps as delta-of-deltas, values as the XOR with the previous value.
+
+Both transforms turn slowly varying series into mostly small integers or
+zeros. Where Gorilla then writes one variable-length code per sample, this
+encoding packs the integers per block in a layout NumPy can encode and
+decode in bulk:
+
+  - a bitmap of which entries are non-zero (zeros cost one bit);
+  - the non-zero entries in groups of GROUP, each group with one trailing-zero
+    shift and one bit width shared by its entries, bit-packed.
+
+Timestamps are stored as integer microseconds. A file holds independent
+blocks of up to BLOCK_SIZE samples and an index of their time ranges, so a
+range read only decodes the blocks it touches.
+"""
+import struct
+import numpy as np
+
+BLOCK_SIZE = 4096
+GROUP = 64
+MAGIC = b"MIMICGOR"
+VERSION = 1
+
+BLOCK_HEADER = struct.Struct("<IIIqqQ")     # n, timestamp bytes, value bytes, t0, first delta, first value bits
+FILE_HEADER = struct.Struct("<8sII")        # magic, version, number of blocks
+INDEX_ENTRY = struct.Struct("<ddQII")       # first t, last t, offset, size, samples
+
+_U64 = np.uint64
+
+
+def _bit_length(x):
+    """Bit length of every uint64 in x."""
+    hi = (x >> _U64(32)).astype(np.float64)
+    lo = (x & _U64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(hi > 0, np.frexp(hi)[1] + 32, np.frexp(lo)[1]).astype(np.int64)
+
+
+def _trailing_zeros(x):
+    lowest = x & (~x + _U64(1))
+    return np.where(x > 0, _bit_length(lowest) - 1, 64)
+
+
+def _pack(values, widths):
+    """Concatenates the low widths[i] bits of values[i], most significant first."""
+    if not len(values):
+        return b""
+    bits = np.unpackbits(values.astype('>u8').view(np.uint8).reshape(-1, 8), axis=1)
+    keep = np.arange(64) >= (64 - widths)[:, None]
+    return np.packbits(bits[keep]).tobytes()
+
+
+def _unpack(buf, widths):
+    """Inverse of _pack."""
+    n = len(widths)
+    if n == 0:
+        return np.zeros(0, _U64)
+    data = np.frombuffer(bytes(buf) + bytes(9), np.uint8)
+    starts = np.cumsum(widths) - widths
+    first = starts // 8
+    skew = (starts % 8).astype(_U64)
+    # The 9 bytes from the first byte of every value hold all of its bits
+    window = data[first[:, None] + np.arange(9)]
+    head = np.ascontiguousarray(window[:, :8]).view('>u8').ravel().astype(_U64)
+    tail = window[:, 8].astype(_U64)
+    aligned = (head << skew) | np.where(skew > 0, tail >> (_U64(8) - skew), _U64(0))
+    w = widths.astype(_U64)
+    return np.where(w > 0, aligned >> ((_U64(64) - w) % _U64(64)), _U64(0))
+
+
+def _encode_stream(u):
+    """Encodes a uint64 array as (non-zero bitmap, group shifts, group widths, packed bits)."""
+    nonzero = u != 0
+    x = u[nonzero]
+    groups = -(-len(x) // GROUP)
+    shifts = np.zeros(groups, np.uint8)
+    widths = np.zeros(groups, np.uint8)
+    if len(x):
+        padded = np.zeros(groups * GROUP, _U64)
+        padded[:len(x)] = x
+        rows = padded.reshape(groups, GROUP)
+        tz = _trailing_zeros(rows)
+        shifts[:] = tz.min(axis=1).clip(0, 63)
+        shifted = x >> np.repeat(shifts, GROUP)[:len(x)].astype(_U64)
+        widths[:] = _bit_length(np.bitwise_or.reduce(
+            np.pad(shifted, (0, groups * GROUP - len(x))).reshape(groups, GROUP), axis=1))
+        packed = _pack(shifted, np.repeat(widths, GROUP)[:len(x)].astype(np.int64))
+    else:
+        packed = b""
+    return np.packbits(nonzero).tobytes() + shifts.tobytes() + widths.tobytes() + packed
+
+
+def _decode_stream(buf, n):
+    flag_bytes = -(-n // 8)
+    nonzero = np.unpackbits(np.frombuffer(buf, np.uint8, flag_bytes))[:n].astype(bool)
+    k = int(nonzero.sum())
+    groups = -(-k // GROUP)
+    shifts = np.frombuffer(buf, np.uint8, groups, flag_bytes)
+    widths = np.frombuffer(buf, np.uint8, groups, flag_bytes + groups)
+    packed = buf[flag_bytes + 2 * groups:]
+    x = _unpack(packed, np.repeat(widths, GROUP)[:k].astype(np.int64))
+    x <<= np.repeat(shifts, GROUP)[:k].astype(_U64)
+    u = np.zeros(n, _U64)
+    u[nonzero] = x
+    return u
+
+
+def _zigzag(d):
+    return ((d << 1) ^ (d >> 63)).astype(_U64)
+
+
+def _unzigzag(u):
+    return (u >> _U64(1)).astype(np.int64) ^ -(u & _U64(1)).astype(np.int64)
+
+
+def quantize(t):
+    """Rounds a time in seconds to the microsecond resolution of stored timestamps."""
+    return round(t * 1e6) / 1e6
+
+
+def encode_block(timestamps, values) -> bytes:
+    """Encodes up to a few thousand samples; timestamps must be in seconds."""
+    n = len(timestamps)
+    ticks = np.round(np.asarray(timestamps, np.float64) * 1e6).astype(np.int64)
+    bits = np.ascontiguousarray(values, np.float64).view(_U64)
+    deltas = np.diff(ticks)
+    dod = np.diff(deltas)
+    t_stream = _encode_stream(_zigzag(dod))
+    v_stream = _encode_stream(bits[1:] ^ bits[:-1])
+    header = BLOCK_HEADER.pack(n, len(t_stream), len(v_stream), int(ticks[0]) if n else 0,
+                               int(deltas[0]) if n > 1 else 0, int(bits[0]) if n else 0)
+    return header + t_stream + v_stream
+
+
+def decode_block(buf):
+    """Returns (timestamps, values) as float64 arrays."""
+    n, t_size, v_size, t0, d0, v0 = BLOCK_HEADER.unpack_from(buf)
+    if n == 0:
+        return np.empty(0), np.empty(0)
+    start = BLOCK_HEADER.size
+    dod = _unzigzag(_decode_stream(buf[start:start + t_size], max(n - 2, 0)))
+    xors = _decode_stream(buf[start + t_size:start + t_size + v_size], n - 1)
+
+    deltas = np.empty(n - 1, np.int64)
+    if n > 1:
+        deltas[0] = d0
+        deltas[1:] = d0 + np.cumsum(dod)
+    ticks = np.empty(n, np.int64)
+    ticks[0] = t0
+    ticks[1:] = t0 + np.cumsum(deltas)
+
+    bits = np.empty(n, _U64)
+    bits[0] = v0
+    bits[1:] = xors
+    bits = np.bitwise_xor.accumulate(bits)
+    return ticks / 1e6, bits.view(np.float64)
+
+
+def write_file(path, timestamps, values, block_size=BLOCK_SIZE):
+    """Writes a compressed series file: header, block index, blocks."""
+    blocks = []
+    for i in range(0, len(timestamps), block_size):
+        t = timestamps[i:i + block_size]
+        blocks.append((float(t[0]), float(t[-1]), len(t), encode_block(t, values[i:i + block_size])))
+    offset = FILE_HEADER.size + INDEX_ENTRY.size * len(blocks)
+    with open(path, "wb") as f:
+        f.write(FILE_HEADER.pack(MAGIC, VERSION, len(blocks)))
+        for first, last, n, data in blocks:
+            f.write(INDEX_ENTRY.pack(first, last, offset, len(data), n))
+            offset += len(data)
+        for block in blocks:
+            f.write(block[3])
+
+
+class GorillaFile:
+    """Read access to a file made by write_file(). Only the blocks a query touches are decoded."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, n_blocks = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a MIMIC compressed series")
+            if version != VERSION:
+                raise ValueError(f"Unsupported compressed series version {version} in {path}")
+            index = f.read(INDEX_ENTRY.size * n_blocks)
+        self.index = [INDEX_ENTRY.unpack_from(index, i * INDEX_ENTRY.size) for i in range(n_blocks)]
+        self.count = sum(entry[4] for entry in self.index)
+
+    def read(self, start=None, end=None):
+        """
+        Returns (timestamps, values) with start <= timestamp < end. The bounds
+        are rounded to microseconds like the stored timestamps, so a sample
+        taken exactly at `start` is not lost to the rounding.
+        """
+        start = None if start is None else quantize(start)
+        end = None if end is None else quantize(end)
+        wanted = [e for e in self.index
+                  if (start is None or quantize(e[1]) >= start) and (end is None or quantize(e[0]) < end)]
+        if not wanted:
+            return np.empty(0), np.empty(0)
+        parts = []
+        with open(self.path, "rb") as f:
+            for first, last, offset, size, n in wanted:
+                f.seek(offset)
+                parts.append(decode_block(f.read(size)))
+        t = np.concatenate([p[0] for p in parts])
+        v = np.concatenate([p[1] for p in parts])
+        lo = 0 if start is None else np.searchsorted(t, start, side='left')
+        hi = len(t) if end is None else np.searchsorted(t, end, side='left')
+        return t[lo:hi], v[lo:hi]
@@ -0,0 +1,464 @@
+"""
+On-disk history of every numeric status channel.
+
+Each channel has its own directory, <root>/<device>/<parameter>/, holding
+fixed-size segment files. A segment is a 64-byte header followed by two
+float64 columns (timestamps, then values) of `capacity` entries each, and is
+named after the time of its first sample. A new segment is started when the
+current one is full or spans more than segment_seconds. Unless compression is
+turned off, a segment the writer has moved on from is rewritten as a .gor file
+(see gorilla) and the .seg file removed.
+
+Samples are handed over on the network thread and written in batches, through
+memory maps, by a background thread. Queries map segments read-only and
+return NumPy views, so only the pages that cover the requested range are read
+from disk; compressed segments decode only the blocks in the range. The same
+thread keeps the channel's rollup tiers (see rollups) up to date, and
+plot_data() uses them to draw long time spans.
+"""
+import atexit
+import os
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from src.gui.storage.rollups import Rollups, TIERS, coarsen
+from src.gui.storage.gorilla import GorillaFile, write_file
+from src.gui.storage.decimation import minmax_decimate, interleave
+
+MAGIC = b"MIMICSEG"
+VERSION = 1
+HEADER = struct.Struct("<8sIIqqd")  # magic, version, reserved, capacity, count, start time
+HEADER_SIZE = 64
+COUNT_OFFSET = 24
+
+SEGMENT_SAMPLES = 65_536       # samples per segment file
+SEGMENT_SECONDS = 3600.0       # time span after which a new segment is started
+FLUSH_INTERVAL = 1.0           # seconds between background writes
+OPEN_SEGMENTS = 64             # read-only segment maps kept open for queries
+
+
+def _safe_name(name):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(name))
+
+
+class Segment:
+    """One segment file, mapped into memory. mode is "r" for queries, "r+" for the writer."""
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, _, capacity, count, start = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a MIMIC historian segment")
+        if version != VERSION:
+            raise ValueError(f"Unsupported segment version {version} in {path}")
+        self.capacity = capacity
+        self.start = start
+        self.mode = mode
+        self._count = np.memmap(path, dtype=np.int64, mode=mode, offset=COUNT_OFFSET, shape=(1,))
+        self._t = np.memmap(path, dtype=np.float64, mode=mode, offset=HEADER_SIZE, shape=(capacity,))
+        self._v = np.memmap(path, dtype=np.float64, mode=mode, offset=HEADER_SIZE + 8 * capacity,
+                            shape=(capacity,))
+
+    @classmethod
+    def create(cls, path, capacity, start):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, capacity, 0, start).ljust(HEADER_SIZE, b"\0"))
+            f.truncate(HEADER_SIZE + 16 * capacity)
+        return cls(path, "r+")
+
+    @property
+    def count(self):
+        return int(self._count[0])
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def append(self, timestamps, values):
+        """Writes as many samples as fit and returns how many were written."""
+        count = self.count
+        n = min(len(timestamps), self.capacity - count)
+        self._t[count:count + n] = timestamps[:n]
+        self._v[count:count + n] = values[:n]
+        # Publish the new count only after the data is in place
+        self._count[0] = count + n
+        return n
+
+    def flush(self):
+        self._t.flush()
+        self._v.flush()
+        self._count.flush()
+
+    def close(self):
+        """
+        Drops the memory maps, after flushing them if writable. Windows refuses
+        to delete a file that is still mapped, so this comes before removing it.
+        """
+        if self._t is None:
+            return
+        if self.mode != "r":
+            self.flush()
+        self._count = self._t = self._v = None
+
+    def view(self):
+        count = self.count
+        return self._t[:count], self._v[:count]
+
+    def read(self, start=None, end=None):
+        t, v = self.view()
+        lo = 0 if start is None else np.searchsorted(t, start, side='left')
+        hi = len(t) if end is None else np.searchsorted(t, end, side='left')
+        return t[lo:hi], v[lo:hi]
+
+
+class HistorianChannel:
+    """
+    Write handle of one channel. append() is the route tap called on the
+    network thread; it only queues the sample for the writer thread.
+    """
+
+    def __init__(self, historian, device, parameter, directory):
+        self.historian = historian
+        self.device = device
+        self.parameter = parameter
+        self.directory = directory
+        self.segment = None     # segment being written, owned by the writer thread
+        self.rollups = Rollups(directory, historian.rollup_tiers)
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            self._pending.append((timestamp, value))
+
+    def take(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+    def requeue(self, timestamps, values):
+        """Puts samples that could not be written back in front of the queue."""
+        with self._lock:
+            self._pending[:0] = zip(timestamps.tolist(), values.tolist())
+
+    def plot_data(self, start, end, width):
+        return self.historian.plot_data(self.device, self.parameter, start, end, width)
+
+
+class Historian:
+    """
+    Persistent, append-only store of (timestamp, value) per (device, parameter).
+
+    channel() returns the write handle used as a route tap; query() reads any
+    time range back, query_rollup() its aggregates and plot_data() whatever is
+    cheapest to draw. Segments older than retention_days are deleted.
+    """
+
+    def __init__(self, root, segment_seconds=SEGMENT_SECONDS, segment_samples=SEGMENT_SAMPLES,
+                 retention_days=None, rollup_tiers=TIERS, compress=True):
+        self.root = root
+        self.compress = compress
+        self.rollup_tiers = tuple(rollup_tiers)
+        self.segment_seconds = float(segment_seconds)
+        self.segment_samples = int(segment_samples)
+        self.retention_days = retention_days
+        self.written = 0
+        self.write_time = 0.0   # seconds spent in the writer thread
+        self._channels = {}     # (device, parameter) -> HistorianChannel
+        self._read_rollups = {} # (device, parameter) -> read-only Rollups of channels not written to
+        self._unchecked = []    # new channel directories whose old segments may need compressing
+        self._lock = threading.Lock()
+        self._readers = OrderedDict()   # path -> read-only Segment or GorillaFile
+        self._readers_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_prune = 0.0
+        os.makedirs(root, exist_ok=True)
+
+    # --- writing ---
+
+    def channel(self, device, parameter) -> HistorianChannel:
+        key = (device, parameter)
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is None:
+                directory = self._directory(device, parameter)
+                os.makedirs(directory, exist_ok=True)
+                channel = HistorianChannel(self, device, parameter, directory)
+                self._channels[key] = channel
+                self._unchecked.append(directory)
+            return channel
+
+    def _rollups(self, device, parameter):
+        """
+        Rollups of a channel for queries from any thread: the writer's own if the
+        channel is open for writing, otherwise a read-only view of its files.
+        """
+        key = (device, parameter)
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is not None:
+                return channel.rollups
+            rollups = self._read_rollups.get(key)
+            if rollups is None:
+                rollups = Rollups(self._directory(device, parameter), self.rollup_tiers, writable=False)
+                self._read_rollups[key] = rollups
+            return rollups
+
+    def record(self, device, parameter, timestamp, value):
+        self.channel(device, parameter).append(timestamp, value)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="Historian", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+        with self._lock:
+            for channel in self._channels.values():
+                channel.rollups.close()
+
+    def _run(self):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            try:
+                self.flush()
+                if self.retention_days and time.time() - self._last_prune > 3600:
+                    self.prune()
+            except Exception as e:
+                print(f"[Historian] Write failed: {e}")
+
+    def flush(self):
+        """Writes every queued sample to its segment files."""
+        t0 = time.perf_counter()
+        with self._lock:
+            channels = list(self._channels.values())
+            unchecked, self._unchecked = self._unchecked, []
+        for directory in unchecked:
+            self._compress_sealed(directory)
+        for channel in channels:
+            pending = channel.take()
+            if pending:
+                samples = np.array(pending, dtype=np.float64)
+                written = self._write(channel, samples[:, 0], samples[:, 1])
+                channel.rollups.add(samples[:written, 0], samples[:written, 1])
+                self.written += written
+                if channel.segment is not None:
+                    channel.segment.flush()
+        self.write_time += time.perf_counter() - t0
+
+    def _write(self, channel, timestamps, values):
+        """
+        Appends a batch to the channel's segments and returns how many samples
+        were written. If writing fails the rest goes back into the channel's
+        queue, to be retried on the next flush.
+        """
+        written = 0
+        try:
+            while written < len(timestamps):
+                t, v = timestamps[written:], values[written:]
+                segment = channel.segment
+                if segment is None:
+                    segment = self._open_last_segment(channel)
+                if segment is None or segment.full or t[0] - segment.start >= self.segment_seconds:
+                    channel.segment = None
+                    if segment is not None:
+                        self._seal(segment)
+                    path = os.path.join(channel.directory, f"{int(t[0] * 1e6):020d}.seg")
+                    segment = Segment.create(path, self.segment_samples, float(t[0]))
+                channel.segment = segment
+                # Split the batch where the segment's time span ends
+                limit = max(np.searchsorted(t, segment.start + self.segment_seconds, side='left'), 1)
+                written += segment.append(t[:limit], v[:limit])
+        except Exception as e:
+            channel.requeue(timestamps[written:], values[written:])
+            print(f"[Historian] Writing {channel.device}/{channel.parameter} failed, "
+                  f"{len(timestamps) - written} samples kept for the next flush: {e}")
+        return written
+
+    def _open_last_segment(self, channel):
+        """Continues the newest segment of a channel after a restart."""
+        files = self._segment_files(channel.directory)
+        if not files or not files[-1][1].endswith(".seg"):
+            return None
+        segment = Segment(os.path.join(channel.directory, files[-1][1]), "r+")
+        return None if segment.full else segment
+
+    def _seal(self, segment):
+        """
+        Called when the writer moves on to a new segment. A segment that cannot
+        be compressed stays a complete .seg file; the next start retries.
+        """
+        segment.close()
+        if self.compress:
+            try:
+                self._compress(segment.path)
+            except (OSError, ValueError) as e:
+                print(f"[Historian] Could not compress {segment.path}: {e}")
+
+    def _compress(self, path):
+        """
+        Rewrites a sealed segment as a .gor file next to it and removes the
+        .seg file. A .seg whose .gor already exists is only removed.
+        """
+        target = os.path.splitext(path)[0] + ".gor"
+        if not os.path.exists(target):
+            segment = Segment(path, "r")
+            t, v = segment.view()
+            if len(t):
+                write_file(target + ".tmp", t, v)
+            del t, v
+            segment.close()
+            if os.path.exists(target + ".tmp"):
+                os.replace(target + ".tmp", target)
+        self._drop_reader(path)
+        os.remove(path)
+
+    def _compress_sealed(self, directory):
+        """
+        Compresses segments left uncompressed, e.g. by a crash; the newest one
+        stays writable. Runs on the writer thread, for channels opened since the
+        last flush.
+        """
+        if not self.compress:
+            return
+        files = self._segment_files(directory)
+        names = [name for _, name in files[:-1] if name.endswith(".seg")]
+        # .seg files already rewritten as .gor whose removal failed are not listed
+        names += [name[:-4] + ".seg" for _, name in files if name.endswith(".gor")
+                  and os.path.exists(os.path.join(directory, name[:-4] + ".seg"))]
+        for name in names:
+            try:
+                self._compress(os.path.join(directory, name))
+            except (OSError, ValueError) as e:
+                print(f"[Historian] Could not compress {name}: {e}")
+
+    def prune(self):
+        """Deletes segments whose newest sample is older than retention_days."""
+        self._last_prune = time.time()
+        if not self.retention_days:
+            return
+        cutoff = time.time() - self.retention_days * 86400
+        with self._lock:
+            directories = [c.directory for c in self._channels.values()]
+        for directory in directories:
+            files = self._segment_files(directory)
+            # A segment ends where the next one starts; the newest is always kept
+            for (start, name), (next_start, _) in zip(files, files[1:]):
+                if next_start < cutoff:
+                    self._drop_reader(os.path.join(directory, name))
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError as e:
+                        print(f"[Historian] Could not delete {name}: {e}")
+
+    # --- reading ---
+
+    def _directory(self, device, parameter):
+        return os.path.join(self.root, _safe_name(device), _safe_name(parameter))
+
+    @staticmethod
+    def _segment_files(directory):
+        """Returns [(start time, file name)] sorted by time."""
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        files = []
+        compressed = {name[:-4] for name in names if name.endswith(".gor")}
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            # A .seg next to its .gor is one whose removal failed: the .gor has its data
+            if ext == ".gor" or (ext == ".seg" and stem not in compressed):
+                if stem.isdigit():
+                    files.append((int(stem) / 1e6, name))
+        files.sort()
+        return files
+
+    def _reader(self, path):
+        with self._readers_lock:
+            segment = self._readers.get(path)
+            if segment is None:
+                segment = GorillaFile(path) if path.endswith(".gor") else Segment(path, "r")
+                self._readers[path] = segment
+                if len(self._readers) > OPEN_SEGMENTS:
+                    self._readers.popitem(last=False)
+            else:
+                self._readers.move_to_end(path)
+            return segment
+
+    def _drop_reader(self, path):
+        """Evicts a file from the reader cache; its maps go once no query uses them."""
+        with self._readers_lock:
+            self._readers.pop(path, None)
+
+    def channels(self):
+        """Lists the (device, parameter) directories present on disk."""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for device in sorted(os.listdir(self.root)):
+            device_dir = os.path.join(self.root, device)
+            if os.path.isdir(device_dir):
+                found.extend((device, p) for p in sorted(os.listdir(device_dir))
+                             if os.path.isdir(os.path.join(device_dir, p)))
+        return found
+
+    def query(self, device, parameter, start=None, end=None):
+        """
+        Returns (timestamps, values) with start <= timestamp < end. A range within
+        one uncompressed segment comes back as read-only views of the memory map;
+        anything else is decoded or concatenated into new arrays.
+        """
+        directory = self._directory(device, parameter)
+        files = self._segment_files(directory)
+        parts = []
+        for i, (seg_start, name) in enumerate(files):
+            seg_end = files[i + 1][0] if i + 1 < len(files) else None
+            if end is not None and seg_start >= end:
+                break
+            if start is not None and seg_end is not None and seg_end <= start:
+                continue
+            t, v = self._reader(os.path.join(directory, name)).read(start, end)
+            if len(t):
+                parts.append((t, v))
+        if not parts:
+            return np.empty(0), np.empty(0)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def query_rollup(self, device, parameter, width, start=None, end=None):
+        """Returns the `width`-second buckets in [start, end) as a rollups.BUCKET array."""
+        return self._rollups(device, parameter).tier(width).query(start, end)
+
+    def plot_data(self, device, parameter, start, end, width):
+        """
+        Returns a (timestamps, values) min/max envelope of [start, end) with about
+        `width` buckets, read from the coarsest rollup tier that still has one
+        bucket per pixel, or from the raw samples for short spans.
+        """
+        tier = self._rollups(device, parameter).plan(start, end, width)
+        if tier is None:
+            t, v = self.query(device, parameter, start, end)
+            return minmax_decimate(t, v, width)
+        buckets = tier.query(start, end)
+        # The tier can hold many buckets per pixel: merge them down to one
+        pixel = max((end - start) / max(int(width), 1), tier.width)
+        buckets = coarsen(buckets, pixel)
+        return interleave(buckets['t'], buckets['min'], buckets['t'] + pixel / 2, buckets['max'])
@@ -0,0 +1,67 @@
+"""
+Latest received value of every parameter, with its receive time.
+
+The network thread records each decoded status sample here (see
+MqttHandler.ingest). snapshot() copies the entries of the parameters asked
+for under the same lock the writers take, so a scan row sees one consistent
+moment across all channels, at O(selected parameters) cost. It can also wait
+until chosen parameters have reported a value received after a given time,
+e.g. after the scan moved them.
+"""
+import threading
+import time
+from typing import NamedTuple, Any
+
+
+class Reading(NamedTuple):
+    value: Any
+    timestamp: float    # time.time() the value was received
+    age: float          # seconds between receiving it and the snapshot
+
+
+class LatestValues:
+    def __init__(self):
+        self._values = {}   # parameter -> (value, timestamp)
+        self._changed = threading.Condition()
+
+    def __contains__(self, parameter):
+        return parameter in self._values
+
+    def update(self, parameter, value, timestamp):
+        with self._changed:
+            self._values[parameter] = (value, timestamp)
+            self._changed.notify_all()
+
+    def get(self, parameter):
+        """Returns the parameter's latest Reading, or None if it never reported."""
+        entry = self._values.get(parameter)
+        if entry is None:
+            return None
+        return Reading(entry[0], entry[1], time.time() - entry[1])
+
+    def snapshot(self, parameters, fresh_since=None, timeout=0.0, cancelled=None):
+        """
+        Returns ({parameter: Reading}, stale) for the given parameters; those
+        that never reported are left out of the dict.
+
+        fresh_since maps parameters to a time.time() their value must have been
+        received after. snapshot() waits up to `timeout` seconds for that (or
+        until cancelled() returns True, checked every 100 ms); `stale` lists the
+        parameters still older when it gives up.
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                stale = [p for p, since in (fresh_since or {}).items()
+                         if p not in self._values or self._values[p][1] < since]
+                remaining = deadline - time.monotonic()
+                if not stale or remaining <= 0 or (cancelled is not None and cancelled()):
+                    break
+                self._changed.wait(min(remaining, 0.1))
+            entries = [(p, self._values.get(p)) for p in parameters]
+        now = time.time()
+        readings = {p: Reading(e[0], e[1], now - e[1]) for p, e in entries if e is not None}
+        return readings, stale
+
+
+latest = LatestValues()
@@ -0,0 +1,140 @@
+"""
+Constant-time statistics over the last N samples of a stream.
+
+RollingStats keeps running sums of the samples minus a reference value (the
+first sample after the last rebase), so that readings like 384.2283 THz with
+MHz-level scatter do not lose their variance to cancellation. Adding and
+evicting a sample is O(1). Every `window` updates the sums are recomputed
+exactly from the window and the reference moved to the current mean, which
+bounds the rounding error that add/subtract cycles accumulate.
+
+ThresholdMean is the cross-channel aggregate: the mean of the latest value of
+every key that is below a threshold, updated in O(1) when one key changes.
+"""
+import math
+from collections import deque
+
+
+class RollingStats:
+    """
+    Count, mean, variance and std of the last `window` samples, or, with
+    `seconds`, of the samples of the last `seconds` (at most `window` of them).
+    """
+
+    def __init__(self, window=50, seconds=None):
+        self.window = max(int(window), 1)
+        self.seconds = seconds
+        self.values = deque()
+        self.times = deque()    # timestamps, only kept with `seconds`
+        self._ref = 0.0
+        self._sum = 0.0     # sum of (x - ref)
+        self._sumsq = 0.0   # sum of (x - ref)**2
+        self._updates = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    def clear(self):
+        self.values.clear()
+        self.times.clear()
+        self._sum = self._sumsq = 0.0
+        self._updates = 0
+
+    def push(self, x, timestamp=None):
+        x = float(x)
+        if not math.isfinite(x):
+            return
+        if not self.values:
+            self._ref = x
+        self.values.append(x)
+        d = x - self._ref
+        self._sum += d
+        self._sumsq += d * d
+        if self.seconds is not None:
+            self.times.append(timestamp)
+            while timestamp - self.times[0] > self.seconds:
+                self._evict()
+        if len(self.values) > self.window:
+            self._evict()
+        self._updates += 1
+        if self._updates >= self.window:
+            self._rebase()
+
+    def _evict(self):
+        old = self.values.popleft() - self._ref
+        if self.times:
+            self.times.popleft()
+        self._sum -= old
+        self._sumsq -= old * old
+
+    def _rebase(self):
+        """Recomputes the sums exactly, around the current mean."""
+        self._updates = 0
+        n = len(self.values)
+        if not n:
+            return
+        self._ref = sum(self.values) / n
+        self._sum = sum(v - self._ref for v in self.values)
+        self._sumsq = sum((v - self._ref) ** 2 for v in self.values)
+
+    @property
+    def mean(self):
+        n = len(self.values)
+        return self._ref + self._sum / n if n else 0.0
+
+    @property
+    def variance(self):
+        """Population variance, like statistics.pvariance()."""
+        n = len(self.values)
+        if n < 2:
+            return 0.0
+        m = self._sum / n
+        return max(self._sumsq / n - m * m, 0.0)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class ThresholdMean:
+    """Mean of the latest value of every key, counting only values below `threshold`."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.values = {}
+        self._sum = 0.0
+        self._count = 0
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def update(self, key, value):
+        self.remove(key)
+        self.values[key] = value
+        if value < self.threshold:
+            self._sum += value
+            self._count += 1
+        if not self._count:
+            self._sum = 0.0 # don't carry rounding residue into the next values
+
+    def remove(self, key):
+        old = self.values.pop(key, None)
+        if old is not None and old < self.threshold:
+            self._sum -= old
+            self._count -= 1
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def mean(self):
+        """0.0 when no value is below the threshold."""
+        return self._sum / self._count if self._count else 0.0
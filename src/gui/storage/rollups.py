@@ -0,0 +1,230 @@
+"""
+Aggregate tiers of a channel's history, for queries over long time spans.
+
+For each tier width (1 s, 1 min, 1 h by default) the samples are grouped into
+buckets aligned to multiples of the width, and every bucket keeps its count,
+min, max, sum and sum of squares, from which mean and std follow. Tiers are
+updated with each batch the historian writes. Completed buckets are appended
+to one fixed-record file per tier, which stays sorted by time: a late sample
+is merged into its stored bucket, or dropped if that bucket does not exist.
+The bucket still filling up stays in memory and is written when the tier is
+closed, then reopened on the next start.
+
+plan() picks what to read for a time span drawn `width` pixels wide: raw
+samples while a pixel covers less than the finest tier, otherwise the
+coarsest tier that still has at least one bucket per pixel.
+"""
+import os
+import threading
+import numpy as np
+
+TIERS = (1.0, 60.0, 3600.0)  # bucket widths in seconds
+
+BUCKET = np.dtype([
+    ('t', '<f8'),       # bucket start
+    ('count', '<f8'),
+    ('min', '<f8'),
+    ('max', '<f8'),
+    ('sum', '<f8'),
+    ('sumsq', '<f8'),
+])
+
+
+def tier_name(width):
+    if width >= 3600 and width % 3600 == 0:
+        return f"{int(width // 3600)}h"
+    if width >= 60 and width % 60 == 0:
+        return f"{int(width // 60)}m"
+    return f"{width:g}s"
+
+
+def aggregate(timestamps, values, width):
+    """Groups samples into buckets of `width` seconds. Returns a BUCKET array sorted by time."""
+    if not len(timestamps):
+        return np.empty(0, BUCKET)
+    ids = np.floor(timestamps / width)
+    if np.any(np.diff(ids) < 0):
+        order = np.argsort(ids, kind='stable')
+        ids, values = ids[order], values[order]
+    starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+    out = np.empty(len(starts), BUCKET)
+    out['t'] = ids[starts] * width
+    out['count'] = np.diff(np.append(starts, len(ids)))
+    out['min'] = np.minimum.reduceat(values, starts)
+    out['max'] = np.maximum.reduceat(values, starts)
+    out['sum'] = np.add.reduceat(values, starts)
+    out['sumsq'] = np.add.reduceat(values * values, starts)
+    return out
+
+
+def merge(a, b):
+    """Combines two records of the same bucket."""
+    a['count'] += b['count']
+    a['min'] = min(a['min'], b['min'])
+    a['max'] = max(a['max'], b['max'])
+    a['sum'] += b['sum']
+    a['sumsq'] += b['sumsq']
+
+
+def coarsen(buckets, width):
+    """Combines time-sorted buckets into buckets of `width` seconds."""
+    if not len(buckets):
+        return buckets
+    ids = np.floor(buckets['t'] / width)
+    starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+    out = np.empty(len(starts), BUCKET)
+    out['t'] = ids[starts] * width
+    out['min'] = np.minimum.reduceat(buckets['min'], starts)
+    out['max'] = np.maximum.reduceat(buckets['max'], starts)
+    for field in ('count', 'sum', 'sumsq'):
+        out[field] = np.add.reduceat(buckets[field], starts)
+    return out
+
+
+def mean(buckets):
+    return buckets['sum'] / buckets['count']
+
+
+def std(buckets):
+    m = mean(buckets)
+    return np.sqrt(np.maximum(buckets['sumsq'] / buckets['count'] - m * m, 0.0))
+
+
+class RollupTier:
+    """
+    The buckets of one width for one channel, backed by an append-only file.
+    A tier opened with writable=False only reads the file and leaves it as it is.
+    """
+
+    def __init__(self, path, width, writable=True):
+        self.path = path
+        self.width = float(width)
+        self.open = None    # the bucket still receiving samples, a 1-element BUCKET array
+        self._lock = threading.Lock()
+        self._map = None
+        self._mapped = 0
+        self.dropped = 0    # late buckets that had no stored bucket to merge into
+
+        # Take the last stored bucket back in memory: new samples may still fall into it
+        if writable and os.path.exists(path):
+            size = os.path.getsize(path)
+            records = size // BUCKET.itemsize
+            with open(path, "r+b") as f:
+                f.truncate(records * BUCKET.itemsize)
+                if records:
+                    f.seek((records - 1) * BUCKET.itemsize)
+                    self.open = np.frombuffer(f.read(BUCKET.itemsize), BUCKET).copy()
+                    f.truncate((records - 1) * BUCKET.itemsize)
+
+    def add(self, timestamps, values):
+        buckets = aggregate(timestamps, values, self.width)
+        if not len(buckets):
+            return
+        with self._lock:
+            done = []
+            if self.open is not None:
+                open_t = self.open[0]['t']
+                same = buckets['t'] == open_t
+                if same.any():
+                    merge(self.open[0], buckets[same][0])
+                # Samples older than the open bucket (clock stepped back) must not be
+                # appended behind it: query() relies on the file being sorted
+                late = buckets[buckets['t'] < open_t]
+                if len(late):
+                    self._merge_stored(late)
+                buckets = buckets[buckets['t'] > open_t]
+                if len(buckets):
+                    done.append(self.open)
+                    self.open = None
+            if len(buckets):
+                done.append(buckets[:-1])
+                self.open = buckets[-1:].copy()
+            if done:
+                with open(self.path, "ab") as f:
+                    for block in done:
+                        if len(block):
+                            f.write(block.tobytes())
+
+    def _merge_stored(self, late):
+        """Merges late buckets into the stored ones with the same start, dropping the rest."""
+        stored = self._stored()
+        i = np.searchsorted(stored['t'], late['t'])
+        found = i < len(stored)
+        found[found] = stored['t'][i[found]] == late['t'][found]
+        self.dropped += int(np.count_nonzero(~found))
+        if not found.any():
+            return
+        with open(self.path, "r+b") as f:
+            for index, bucket in zip(i[found], late[found]):
+                record = np.array(stored[index:index + 1])
+                merge(record[0], bucket)
+                f.seek(int(index) * BUCKET.itemsize)
+                f.write(record.tobytes())
+
+    def close(self):
+        """Writes the open bucket, to be taken back by the next RollupTier on this file."""
+        with self._lock:
+            if self.open is not None:
+                with open(self.path, "ab") as f:
+                    f.write(self.open.tobytes())
+                self.open = None
+            self._map = None
+
+    def _stored(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        records = size // BUCKET.itemsize
+        if records == 0:
+            return np.empty(0, BUCKET)
+        if self._map is None or records != self._mapped:
+            self._map = np.memmap(self.path, dtype=BUCKET, mode='r', shape=(records,))
+            self._mapped = records
+        return self._map
+
+    def query(self, start=None, end=None):
+        """Returns the buckets starting in [start, end) as a BUCKET array, the open one included."""
+        with self._lock:
+            stored = self._stored()
+            open_bucket = None if self.open is None else self.open.copy()
+        t = stored['t']
+        lo = 0 if start is None else np.searchsorted(t, np.floor(start / self.width) * self.width, side='left')
+        hi = len(t) if end is None else np.searchsorted(t, end, side='left')
+        result = stored[lo:hi]
+        if open_bucket is not None and (end is None or open_bucket[0]['t'] < end) \
+                and (start is None or open_bucket[0]['t'] + self.width > start):
+            result = np.concatenate((result, open_bucket))
+        return result
+
+
+class Rollups:
+    """All tiers of one channel, stored next to its segments."""
+
+    def __init__(self, directory, tiers=TIERS, writable=True):
+        self.tiers = [RollupTier(os.path.join(directory, f"rollup_{tier_name(w)}.bin"), w, writable)
+                      for w in sorted(tiers)]
+
+    def add(self, timestamps, values):
+        for tier in self.tiers:
+            tier.add(timestamps, values)
+
+    def close(self):
+        for tier in self.tiers:
+            tier.close()
+
+    def plan(self, start, end, width):
+        """
+        Returns the tier to read for [start, end) drawn `width` pixels wide,
+        or None when raw samples are needed. The tier may still have several
+        buckets per pixel: coarsen() them to the pixel width before drawing.
+        """
+        pixel = (end - start) / max(int(width), 1)
+        chosen = None
+        for tier in self.tiers:
+            if tier.width <= pixel:
+                chosen = tier
+        return chosen
+
+    def tier(self, width):
+        for tier in self.tiers:
+            if tier.width == width:
+                return tier
+        raise KeyError(f"No {width} s rollup tier")
@@ -0,0 +1,142 @@
+import threading
+import numpy as np
+
+DEFAULT_CAPACITY = 10_000 # samples kept per channel
+
+
+class RingBuffer:
+    """
+    Fixed-size (timestamp, value) history of one channel, stored as float64.
+
+    The arrays are allocated once with twice the capacity and every sample is
+    written at index i and i + capacity. The newest `capacity` samples are
+    therefore always one contiguous slice, and view() returns NumPy views into
+    the buffer instead of copies.
+
+    append() is called on the network thread, readers run on the GUI or scan
+    threads. A view stays valid until the writer wraps around to it: take a
+    copy if the data has to outlive the next `capacity` samples.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = int(capacity)
+        self._t = np.zeros(2 * self.capacity)
+        self._v = np.zeros(2 * self.capacity)
+        self._pos = 0       # next write index, in [0, capacity)
+        self.count = 0      # samples written since creation or clear()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp, value):
+        """Stores one sample. Values that are not numbers are ignored."""
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            i = self._pos
+            j = i + self.capacity
+            self._t[i] = self._t[j] = timestamp
+            self._v[i] = self._v[j] = value
+            self._pos = i + 1 if i + 1 < self.capacity else 0
+            self.count += 1
+
+    def extend(self, timestamps, values):
+        """Stores a batch of numeric samples, oldest first."""
+        timestamps = np.asarray(timestamps, dtype=float)[-self.capacity:]
+        values = np.asarray(values, dtype=float)[-self.capacity:]
+        n = len(timestamps)
+        with self._lock:
+            idx = (self._pos + np.arange(n)) % self.capacity
+            self._t[idx] = self._t[idx + self.capacity] = timestamps
+            self._v[idx] = self._v[idx + self.capacity] = values
+            self._pos = (self._pos + n) % self.capacity
+            self.count += n
+
+    def clear(self):
+        with self._lock:
+            self._pos = 0
+            self.count = 0
+
+    def snapshot(self):
+        """
+        Returns (count, timestamps, values): read-only views of every stored
+        sample and the number of samples written when they were taken. Element
+        i of the views is sample number count - len(timestamps) + i.
+        """
+        with self._lock:
+            count = self.count
+            n = min(count, self.capacity)
+            start = self._pos if count >= self.capacity else 0
+            t = self._t[start:start + n]
+            v = self._v[start:start + n]
+        t.flags.writeable = False
+        v.flags.writeable = False
+        return count, t, v
+
+    def view(self, since=None, last=None):
+        """
+        Returns read-only (timestamps, values) views, oldest first.
+        since keeps samples with timestamp >= since, last keeps the newest n.
+        """
+        _, t, v = self.snapshot()
+        if since is not None:
+            first = np.searchsorted(t, since, side='left')
+            t, v = t[first:], v[first:]
+        if last is not None:
+            t, v = t[len(t) - min(last, len(t)):], v[len(v) - min(last, len(v)):]
+        return t, v
+
+    def latest(self):
+        """Returns the newest (timestamp, value), or None if the buffer is empty."""
+        with self._lock:
+            if not self.count:
+                return None
+            i = self._pos - 1 + self.capacity
+            return float(self._t[i]), float(self._v[i])
+
+
+class TimeSeriesStore:
+    """
+    The shared history of every numeric status channel, keyed by
+    (device id, parameter name). Each channel owns one RingBuffer, written by
+    the MQTT router as samples arrive; live graphs, scans and analysis read
+    views of the same buffer instead of keeping their own copies.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._series = {}   # (device, parameter) -> RingBuffer
+        self._lock = threading.Lock()
+
+    def channel(self, device, parameter, capacity=None) -> RingBuffer:
+        """Returns the buffer for device/parameter, creating it on first use."""
+        key = (device, parameter)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = RingBuffer(capacity or self.capacity)
+                self._series[key] = series
+            return series
+
+    def get(self, device, parameter):
+        return self._series.get((device, parameter))
+
+    def remove(self, device, parameter):
+        with self._lock:
+            self._series.pop((device, parameter), None)
+
+    def keys(self):
+        with self._lock:
+            return list(self._series)
+
+    def view(self, device, parameter, since=None, last=None):
+        series = self.get(device, parameter)
+        if series is None:
+            return np.empty(0), np.empty(0)
+        return series.view(since, last)
+
+
+store = TimeSeriesStore() # process-wide store used by the YAML devices
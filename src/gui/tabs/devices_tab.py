@@ -1,4 +1,5 @@
 import os
+import time
 import importlib.util
 from collections import defaultdict
 from typing import List, Optional
@@ -21,6 +22,7 @@ from src.gui.assets.theme_manager import ThemeManager
 from src.gui.devices.frontend.instrument_base import InstrumentBase, Parameter
 from src.gui.widgets.smaller_toggle import AnimatedToggle
 from src.gui.widgets.flow_layout import FlowLayout
+from src.gui.widgets.qtgraph import Graph
 
 class InstrumentFrame(QFrame):
     """
@@ -43,18 +45,36 @@ class InstrumentFrame(QFrame):
 
         self.apply_theme()
 
+    CONNECTION_STYLES = {
+        "connecting": Style.Label.connection_connecting,
+        "connected": Style.Label.connection_connected,
+        "offline": Style.Label.connection_offline,
+    }
+
     def _init_header(self):
-        """Creates the bold title and horizontal divider line."""
+        """Creates the bold title, the connection state and horizontal divider line."""
+        header = QHBoxLayout()
         title = QLabel(self.instrument.name)
         title.setAlignment(Qt.AlignmentFlag.AlignLeft)
         self.styled_widgets.append((title, "Label.title"))
-        self.layout.addWidget(title)
+        header.addWidget(title)
+        header.addStretch()
+
+        self.lbl_connection = QLabel()
+        header.addWidget(self.lbl_connection)
+        self._on_connection_changed(getattr(self.instrument, 'connection_state', 'offline'))
+        self.instrument.connection_changed.connect(self._on_connection_changed)
+        self.layout.addLayout(header)
 
         line = QFrame()
         line.setFrameShape(QFrame.Shape.HLine)
         line.setFrameShadow(QFrame.Shadow.Sunken)
         self.layout.addWidget(line)
 
+    def _on_connection_changed(self, state):
+        self.lbl_connection.setText(state)
+        self.lbl_connection.setStyleSheet(self.CONNECTION_STYLES.get(state, Style.Label.connection_offline))
+
     def _add_parameter_row(self, param: Parameter):
         """Creates a labeled row with an input widget (Toggle or LineEdit)."""
         row_layout = QHBoxLayout()
@@ -180,6 +200,7 @@ class InstrumentPanel(QWidget):
 
         self.category_pages = {}
         self.loaded_instruments = []
+        self.scan_log = {} # flush policy of the scan CSV writer, from the config's scan_log
 
         self._load_and_display_devices()
 
@@ -230,9 +251,13 @@ class InstrumentPanel(QWidget):
         and extracts instantiated instrument classes.
         """
         loaded = []
+        start_t = time.time()
 
         try:
             yml_module = importlib.import_module("src.gui.devices.yaml_plugin")
+            if getattr(yml_module, 'GRAPH_FPS', None):
+                Graph.set_fps(yml_module.GRAPH_FPS)
+            self.scan_log = dict(getattr(yml_module, 'SCAN_LOG', None) or {})
             for attr_name in dir(yml_module):
                 attr = getattr(yml_module, attr_name)
                 if (isinstance(attr, type) and
@@ -251,6 +276,7 @@ class InstrumentPanel(QWidget):
         except Exception as e:
             print(f">> [InstrumentPanel] Critical error loading yaml_plugin: {e}")
 
+        print(f">> [InstrumentPanel] {len(loaded)} devices ready in {(time.time() - start_t) * 1000:.0f} ms")
         return loaded
 
     def _create_all_devices_page(self):
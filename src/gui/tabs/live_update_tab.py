@@ -1,8 +1,8 @@
 import time
-from collections import deque
+import numpy as np
 from typing import List, Optional
 
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import (
     QWidget,
     QHBoxLayout,
@@ -16,6 +16,7 @@ from PyQt6.QtWidgets import (
 from src.gui.assets.csstyle import Style
 from src.gui.assets.theme_manager import ThemeManager
 from src.gui.devices.frontend.instrument_base import InstrumentBase, Parameter
+from src.gui.storage.decimation import Decimator
 from src.gui.widgets.qtgraph import Graph
 from src.gui.widgets.noscrollcombobox import NSCB
 
@@ -24,25 +25,29 @@ class GraphBlock(QFrame):
     """
     A block containing a Graph, a ComboBox to select a parameter,
     and logic to track that parameter over time.
+    The samples come from the parameter's series in the shared time-series
+    store; the block only keeps a view of the last max_window_seconds,
+    downsampled to about one bucket per horizontal pixel, and redrawn by the
+    graph's refresh tick rather than per sample. The part of a long window
+    that is older than the in-memory series is read from the historian.
     """
     def __init__(self, instruments: List[InstrumentBase], parent_widget=None):
         super().__init__()
         self.instruments = instruments
         self.parent_widget = parent_widget
         self.current_param: Optional[Parameter] = None
-        self.data_x = deque()
-        self.data_y = deque()
+        self.series = None
+        self.decimator = None
         self.start_time = time.time()
+        self.reset_time = None  # samples older than this are hidden
+        self._drawn_count = -1  # series.count at the last redraw
+        self._drawn_since = 0.0 # window start at the last redraw
+        self._archived = None   # (cache key, t, v) of the part read from the historian
 
-        self.active_hook_param = None
-        self.active_original_callback = None
         self.max_window_seconds = 60
         self.paused = False
         self.init_ui()
-
-        self.cleanup_timer = QTimer()
-        self.cleanup_timer.timeout.connect(self._cleanup_data)
-        self.cleanup_timer.start(1000)
+        self.graph.source = self._refresh
 
     def init_ui(self):
         self.setFrameShape(QFrame.Shape.StyledPanel)
@@ -79,6 +84,16 @@ class GraphBlock(QFrame):
 
         controls_layout.addLayout(row)
 
+        row = QHBoxLayout()
+        row.addWidget(QLabel("Downsampling:"))
+        self.combo_decimation = NSCB()
+        self.combo_decimation.addItem("Min/Max", "minmax")
+        self.combo_decimation.addItem("LTTB", "lttb")
+        self.combo_decimation.addItem("Off", "none")
+        self.combo_decimation.currentIndexChanged.connect(self._on_decimation_changed)
+        row.addWidget(self.combo_decimation)
+        controls_layout.addLayout(row)
+
         controls_layout.addSpacing(10)
 
         # Start
@@ -164,16 +179,16 @@ class GraphBlock(QFrame):
         try:
             minutes = float(txt)
             self.max_window_seconds = minutes * 60.0
+            self._drawn_count = -1
             print(f"Graph window set to {minutes} minutes ({self.max_window_seconds}s)")
         except ValueError:
             pass
 
     def _on_param_selected(self, index):
-        # DISCONNECT THE OLD PARAMETER FIRST!!!!!!!
-        self._unhook_current_param()
-
         if index <= 0:
             self.current_param = None
+            self.series = None
+            self.decimator = None
             self.reset_graph()
             return
 
@@ -183,27 +198,14 @@ class GraphBlock(QFrame):
 
         inst, param = data
         self.current_param = param
+        self.series = param.series
+        self.decimator = None
+        if self.series is not None:
+            self.decimator = Decimator(self.series, self.combo_decimation.currentData())
+        else:
+            print(f"[LiveUpdate] {inst.name}: {param.name} has no recorded history")
         self.reset_graph()
-
-        # SAVE THE ORIGINAL CALLBACK
-        original_callback = getattr(param, 'update_current_value', None)
-
-        # DEFINE THE INTERCEPTEUR -- change assocated function works like a decorateur
-        def intercepteur(value=None):
-            if value is not None:
-                self._record_value(value)
-            if original_callback:
-                try:
-                    return original_callback(value) #Si il y a une function a la base ca lexecute
-                except Exception as e:
-                    print(f"Error in original callback: {e}")
-
-        # Change le function par intercepteur
-        param.update_current_value = intercepteur
-
-        # STORE ORIGINAL FONCTION ET HOOK POUR RESET LATER
-        self.active_hook_param = param
-        self.active_original_callback = original_callback
+        self.reset_time = None # show the history already recorded
 
         # Update Plot Labels
         self.graph.getPlotItem().setTitle(f"{inst.name} - {param.label or param.name}")
@@ -211,34 +213,54 @@ class GraphBlock(QFrame):
         self.graph.getPlotItem().setLabel('bottom', 'Time', units='s')
 
 
-    def _record_value(self, value):
-        self.lbl_current_value.setText(f"Value: {float(value):.6f}")
-        # print(value)
+    def _on_decimation_changed(self, index):
+        if self.decimator is not None:
+            self.decimator.set_mode(self.combo_decimation.currentData())
+            self._drawn_count = -1
 
-        if self.paused:
+    def _refresh(self):
+        """
+        Redraws the window from the shared series if new samples arrived, or
+        if the window slid by a pixel, so a quiet channel scrolls out of view.
+        """
+        series = self.series
+        if series is None or self.paused:
             return
-
-        t = time.time() - self.start_time
-        try:
-            val = float(value)
-        except (ValueError, TypeError) as e:
-            print(e)
-
-        self.data_x.append(t)
-        self.data_y.append(val)
-
-        self.graph.line_curve.setData(list(self.data_x), list(self.data_y))
-
-    def _cleanup_data(self):
-        if not self.data_x:
+        since = time.time() - self.max_window_seconds
+        if self.reset_time is not None:
+            since = max(since, self.reset_time)
+        width = max(self.graph.width(), 1)
+        if series.count == self._drawn_count and since - self._drawn_since < self.max_window_seconds / width:
             return
-
-        current_t = time.time() - self.start_time
-        limit_t = current_t - self.max_window_seconds
-
-        while self.data_x and self.data_x[0] < limit_t:
-            self.data_x.popleft()
-            self.data_y.popleft()
+        self._drawn_count = series.count
+        self._drawn_since = since
+
+        latest = series.latest()
+        if latest is not None and latest[0] >= since:
+            self.lbl_current_value.setText(f"Value: {latest[1]:.6f}")
+        t, v = self.decimator.query(since, width)
+        # Only a window reaching back past the in-memory series needs the disk
+        oldest = series.view(last=len(series))[0][0] if len(series) else None
+        if oldest is not None and oldest > since:
+            t, v = self._prepend_archived(since, oldest, t, v, width)
+        self.graph.set_data(t - self.start_time, v)
+
+    def _prepend_archived(self, since, oldest, t, v, width):
+        """Adds the historian's data between `since` and `oldest`, the oldest sample still in memory."""
+        archive = getattr(self.current_param, '_archive', None)
+        if archive is None:
+            return t, v
+        pixel = self.max_window_seconds / width  # seconds per pixel of the whole window
+        pixels = max(int((oldest - since) / pixel), 1)
+        # The older part only needs reading again once the window moved by a pixel
+        key = (int(since / pixel), int(oldest / pixel), int(width))
+        if self._archived is None or self._archived[0] != key:
+            old_t, old_v = archive.plot_data(since, oldest, pixels)
+            self._archived = (key, old_t, old_v)
+        _, old_t, old_v = self._archived
+        if not len(old_t):
+            return t, v
+        return np.concatenate((old_t, t)), np.concatenate((old_v, v))
 
     def start_graph(self):
         self.paused = False
@@ -249,25 +271,19 @@ class GraphBlock(QFrame):
         print("Graph Paused")
 
     def reset_graph(self):
-        self.data_x.clear()
-        self.data_y.clear()
-        self.graph.line_curve.setData([], [])
-        self.graph.dot_curve.setData([], [])
+        self.reset_time = time.time()
+        self._drawn_count = -1
+        self.graph.clear_data()
         print("Graph Reset")
 
     def delete_block(self):
-        self._unhook_current_param()
+        self.graph.source = None
+        self.series = None
+        self.decimator = None
 
         if self.parent_widget:
             self.parent_widget.remove_graph_block(self)
 
-    def _unhook_current_param(self):
-        """Restores the original update_widget function for the previous parameter."""
-        if self.active_hook_param is not None:
-            self.active_hook_param.update_current_value = self.active_original_callback
-            self.active_hook_param = None
-            self.active_original_callback = None
-
     def apply_theme(self):
         theme = ThemeManager.get_theme()
         is_dark = theme == "dark"
@@ -275,12 +291,14 @@ class GraphBlock(QFrame):
         if is_dark:
             self.setStyleSheet(Style.Frame.container_dark)
             self.combo.setStyleSheet(Style.ComboBox.dark)
+            self.combo_decimation.setStyleSheet(Style.ComboBox.dark)
             self.lbl_current_value.setStyleSheet(Style.Label.title_dark)
             self.edit_window.setStyleSheet(Style.Input.line_edit_dark)
             self.btn_delete.setStyleSheet(Style.Button.simple_dark)
         else:
             self.setStyleSheet(Style.Frame.container_light)
             self.combo.setStyleSheet(Style.ComboBox.light)
+            self.combo_decimation.setStyleSheet(Style.ComboBox.light)
             self.lbl_current_value.setStyleSheet(Style.Label.title_light)
             self.edit_window.setStyleSheet(Style.Input.line_edit_light)
             self.btn_delete.setStyleSheet(Style.Button.simple_light)
@@ -5,24 +5,27 @@ from datetime import datetime
 from collections import defaultdict
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QLineEdit,
-    QPushButton, QTextEdit, QFrame, QGridLayout, QGroupBox, QStyle, QScrollArea, QSpacerItem
+    QPushButton, QTextEdit, QFrame, QGridLayout, QGroupBox, QStyle, QScrollArea, QSpacerItem, QCheckBox
 )
 from collections import defaultdict
 from src.gui.widgets.qtgraph import Graph
 from src.gui.assets.csstyle import Style
 from src.gui.assets.theme_manager import ThemeManager
 from src.gui.assets.scan_controller import ScanWorker
+from src.gui.assets.scan_plan import ScanPlan, ORDERS, ORDER_LABELS
 from src.gui.assets.icon_utils import CustomIcon
 from src.gui.widgets.noscrollcombobox import NSCB
 
 
 SCAN_CONFIG_FILE = os.path.join(os.getcwd(), 'config', 'scan_axes.json')
+ESTIMATE_MAX_POINTS = {'hilbert': 200_000, 'nearest': 1_000} # larger plans are not ordered just for the estimate
 
 
 class ScanTab(QWidget):
-    def __init__(self, loaded_instruments=[]):
+    def __init__(self, loaded_instruments=[], scan_log=None):
         super().__init__()
         self.loaded_instruments = loaded_instruments
+        self.scan_log = scan_log or {} # DataLogger flush policy
         self.scan_params = []
         self.scan_params_row = []
         self.worker = None
@@ -86,9 +89,54 @@ class ScanTab(QWidget):
         self.inp_repeats = QLineEdit("1")
         self.inp_repeats.setObjectName("scan_repeats")
         self.inp_repeats.setFixedWidth(60)
+        self.inp_repeats.editingFinished.connect(self.update_travel_estimate)
         repeat_layout.addWidget(self.inp_repeats)
         settings_layout.addLayout(repeat_layout)
 
+        start_point_layout = QHBoxLayout()
+        start_point_layout.addWidget(QLabel("Start at Point:"))
+        self.inp_start_point = QLineEdit("1")
+        self.inp_start_point.setObjectName("scan_start_point")
+        self.inp_start_point.setFixedWidth(60)
+        start_point_layout.addWidget(self.inp_start_point)
+        settings_layout.addLayout(start_point_layout)
+
+        settle_layout = QHBoxLayout()
+        settle_layout.addWidget(QLabel("Settling:"))
+        self.combo_settle = NSCB()
+        self.combo_settle.setObjectName("scan_settle")
+        self.combo_settle.addItem("Fixed Delay", "delay")
+        self.combo_settle.addItem("Readback", "readback")
+        self.combo_settle.setToolTip("Readback: move on once every axis' status settled at its target "
+                                     "(settle_* channel fields); the delay only applies to axes without a readback")
+        settle_layout.addWidget(self.combo_settle)
+        settings_layout.addLayout(settle_layout)
+
+        self.chk_fresh = QCheckBox("Require Fresh Readback")
+        self.chk_fresh.setObjectName("scan_fresh_readback")
+        self.chk_fresh.setToolTip("Only record a point once every axis reported a value received after it moved")
+        settings_layout.addWidget(self.chk_fresh)
+
+        self.chk_ages = QCheckBox("Log Reading Ages")
+        self.chk_ages.setObjectName("scan_reading_ages")
+        self.chk_ages.setChecked(True)
+        self.chk_ages.setToolTip("Add a <column>_age column with the age in seconds of every reading in the row")
+        settings_layout.addWidget(self.chk_ages)
+
+        order_layout = QHBoxLayout()
+        order_layout.addWidget(QLabel("Point Order:"))
+        self.combo_order = NSCB()
+        self.combo_order.setObjectName("scan_order")
+        for order in ORDERS:
+            self.combo_order.addItem(ORDER_LABELS[order], order)
+        self.combo_order.currentIndexChanged.connect(self.update_travel_estimate)
+        order_layout.addWidget(self.combo_order)
+        settings_layout.addLayout(order_layout)
+
+        self.lbl_travel = QLabel("")
+        self.lbl_travel.setWordWrap(True)
+        settings_layout.addWidget(self.lbl_travel)
+
 
         settings_layout.addWidget(QLabel("Comments:"))
         self.txt_comments = QTextEdit()
@@ -281,6 +329,38 @@ class ScanTab(QWidget):
         except Exception as e:
             print(f"Error saving scan axes: {e}")
 
+        self.update_travel_estimate()
+
+    def update_travel_estimate(self):
+        """Shows the estimated travel of every point order for the current axes."""
+        if not hasattr(self, 'lbl_travel'):
+            return
+        axes = []
+        try:
+            for combo, start, stop, steps, frame in self.axis_widgets:
+                param = combo.currentData()
+                if not param: continue
+                axes.append({'start': float(start.text()), 'stop': float(stop.text()),
+                             'steps': int(steps.text()), 'weight': param.move_cost})
+            repeats = int(self.inp_repeats.text())
+        except ValueError:
+            self.lbl_travel.setText("")
+            return
+        if not axes:
+            self.lbl_travel.setText("")
+            return
+        plan_size = len(ScanPlan(axes, repeats))
+        estimates = []
+        for order in ORDERS:
+            if plan_size > ESTIMATE_MAX_POINTS.get(order, plan_size):
+                estimates.append(f"{ORDER_LABELS[order]}: -")
+                continue
+            try:
+                estimates.append(f"{ORDER_LABELS[order]}: {ScanPlan(axes, repeats, order).travel_cost():.4g}")
+            except ValueError:
+                estimates.append(f"{ORDER_LABELS[order]}: -")
+        self.lbl_travel.setText("Estimated travel: " + ", ".join(estimates))
+
     def load_scan_axes(self):
         self.loading_config = True
         try:
@@ -324,7 +404,8 @@ class ScanTab(QWidget):
                     'param': param,
                     'start': float(start.text()),
                     'stop': float(stop.text()),
-                    'steps': int(steps.text())
+                    'steps': int(steps.text()),
+                    'weight': param.move_cost
                 })
             except ValueError:
                 self.lbl_status.setText("Error: Invalid number format in axes.")
@@ -337,6 +418,7 @@ class ScanTab(QWidget):
         try:
             delay = float(self.inp_delay.text())
             repeats = int(self.inp_repeats.text())
+            start_point = int(self.inp_start_point.text())
         except ValueError:
              self.lbl_status.setText("Error: Invalid settings.")
              return
@@ -345,6 +427,12 @@ class ScanTab(QWidget):
             'axes': axes_config,
             'delay': delay,
             'repeats': repeats,
+            'start_index': max(start_point - 1, 0),
+            'order': self.combo_order.currentData(),
+            'settle': self.combo_settle.currentData(),
+            'fresh_readback': self.chk_fresh.isChecked(),
+            'reading_ages': self.chk_ages.isChecked(),
+            'log': self.scan_log,
             'comments': self.txt_comments.toPlainText()
         }
 
@@ -358,12 +446,9 @@ class ScanTab(QWidget):
 
         self.scan_data = defaultdict(list)
 
-        self.graph.line_curve.setData([], [])
-
         self.x_data = []
         self.y_data = []
-        self.graph.line_curve.setData([], [])
-        self.graph.dot_curve.setData([], [])
+        self.graph.clear_data()
 
         self.btn_start.setEnabled(False)
         self.btn_abort.setEnabled(True)
@@ -439,9 +524,9 @@ class ScanTab(QWidget):
 
         min_len = min(len(x_vals), len(y_vals))
         if min_len > 0:
-            self.graph.line_curve.setData(x_vals[:min_len], y_vals[:min_len])
+            self.graph.set_data(x_vals[:min_len], y_vals[:min_len])
         else:
-            self.graph.line_curve.setData([], [])
+            self.graph.set_data([], [])
 
     def apply_theme(self):
         theme = ThemeManager.get_theme()
@@ -454,6 +539,9 @@ class ScanTab(QWidget):
             self.grp_settings.setStyleSheet(Style.GroupBox.dark)
             self.inp_delay.setStyleSheet(Style.Input.line_edit_dark)
             self.inp_repeats.setStyleSheet(Style.Input.line_edit_dark)
+            self.inp_start_point.setStyleSheet(Style.Input.line_edit_dark)
+            self.combo_order.setStyleSheet(Style.ComboBox.dark)
+            self.combo_settle.setStyleSheet(Style.ComboBox.dark)
             self.txt_comments.setStyleSheet(Style.Input.text_edit_dark)
             self.grp_controls.setStyleSheet(Style.GroupBox.dark_gray)
             self.lbl_status.setStyleSheet(Style.Label.title_dark)
@@ -469,6 +557,9 @@ class ScanTab(QWidget):
             self.grp_settings.setStyleSheet(Style.GroupBox.light)
             self.inp_delay.setStyleSheet(Style.Input.line_edit_light)
             self.inp_repeats.setStyleSheet(Style.Input.line_edit_light)
+            self.inp_start_point.setStyleSheet(Style.Input.line_edit_light)
+            self.combo_order.setStyleSheet(Style.ComboBox.light)
+            self.combo_settle.setStyleSheet(Style.ComboBox.light)
             self.txt_comments.setStyleSheet(Style.Input.text_edit_light)
             self.grp_controls.setStyleSheet(Style.GroupBox.light_gray)
             self.lbl_status.setStyleSheet(Style.Label.title_light)
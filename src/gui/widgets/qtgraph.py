@@ -1,14 +1,100 @@
+import weakref
 import pyqtgraph as pg
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QObject, QTimer
 from PyQt6.QtGui import QColor, QBrush
 
+GRAPH_FPS = 20 # default repaint rate of the shared graph timer
+SYMBOL_THRESHOLD = 500 # curves with more points are drawn without symbols
+
+
+class GraphRefresher(QObject):
+    """
+    The one timer that repaints every Graph. On each tick it runs the graphs'
+    data sources, then redraws only the graphs whose data changed since the
+    previous tick and that are visible.
+    """
+    _instance = None
+
+    def __init__(self, fps=GRAPH_FPS):
+        super().__init__()
+        self.graphs = weakref.WeakSet()
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.tick)
+        self.set_fps(fps)
+        self.timer.start()
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = GraphRefresher()
+        return cls._instance
+
+    def set_fps(self, fps):
+        self.fps = max(float(fps), 0.1)
+        self.timer.setInterval(int(1000 / self.fps))
+
+    def tick(self):
+        for graph in list(self.graphs):
+            try:
+                graph.refresh()
+            except RuntimeError:
+                # The widget was deleted on the C++ side
+                self.graphs.discard(graph)
+
 
 class Graph(pg.PlotWidget):
+    """
+    Plot widget with a line curve and a dot curve.
+
+    set_data() only stores the new data and marks the graph dirty; the shared
+    GraphRefresher calls setData at most GRAPH_FPS times per second, however
+    often the data changes. A source callback, if set, is called on every tick
+    before that, so pull-style consumers can feed the graph at the frame rate.
+    """
+
     def __init__(self):
         super().__init__()
         self.setBackground(QColor(0, 0, 0, 0))
 
         self.line_curve = self.plot(pen=pg.mkPen(QColor(70, 120, 250), width=2), symbol = 'o')
         self.dot_curve = self.plot(pen=pg.mkPen(QColor(70, 120, 250), width=0), symbol = 'o')
+        self.line_curve.setClipToView(True)
+
+        self.showGrid(x=True, y=True, alpha=0.3)
+
+        self.source = None  # called on every refresh tick, may call set_data()
+        self._pending = None
+        self._dirty = False
+        self._symbols = True
+        GraphRefresher.instance().graphs.add(self)
+
+    @staticmethod
+    def set_fps(fps):
+        """Sets the repaint rate shared by all graphs."""
+        GraphRefresher.instance().set_fps(fps)
+
+    def set_data(self, x, y):
+        """Schedules x/y for the line curve; drawn on the next refresh tick."""
+        self._pending = (x, y)
+        self._dirty = True
+
+    def clear_data(self):
+        self._pending = None
+        self._dirty = False
+        self.line_curve.setData([], [])
+        self.dot_curve.setData([], [])
 
-        self.showGrid(x=True, y=True, alpha=0.3)
\ No newline at end of file
+    def refresh(self):
+        if not self.isVisible():
+            return
+        if self.source is not None:
+            self.source()
+        if not self._dirty:
+            return
+        self._dirty = False
+        x, y = self._pending
+        symbols = len(x) <= SYMBOL_THRESHOLD
+        if symbols != self._symbols:
+            self._symbols = symbols
+            self.line_curve.setSymbol('o' if symbols else None)
+        self.line_curve.setData(x, y)